@@ -1,14 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from starlette.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from backend.routers.chat import router as chat_router
+from backend.schemas.chat import GraphRAGChatbot
+from utils.pipelines.metrics import METRICS
 import uvicorn
 from dotenv import load_dotenv
 
-app = FastAPI()
-
 # load environment variables from .env file
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the chatbot (Neo4j driver, embedder, retriever, LLM) once per process
+    chatbot = GraphRAGChatbot()
+    chatbot.warm_up()
+    app.state.chatbot = chatbot
+    yield
+    await chatbot.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
 # Add routers here
 routers=[
     chat_router,
@@ -31,5 +46,11 @@ app.add_middleware(
 def health_check():
     return {"status": "ok"}
 
+
+# Prometheus text exposition of the GraphRAG metrics (cache hits, stage durations, time to first token)
+@app.get("/metrics")
+def metrics():
+    return Response(METRICS.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=4000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=4000)
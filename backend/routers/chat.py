@@ -1,6 +1,9 @@
 import os
 import json
-from fastapi import APIRouter, HTTPException
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -13,13 +16,20 @@ from ..schemas.chat import ChatRequest, ChatResponse, GraphRAGChatbot, RagChatbo
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+
+def get_chatbot(request: Request) -> GraphRAGChatbot:
+    """Return the process-wide chatbot created in the application lifespan."""
+    return request.app.state.chatbot
+
+
 @router.post("/")
-async def chat(request: ChatRequest) -> ChatResponse:
+async def chat(request: ChatRequest, rag: GraphRAGChatbot = Depends(get_chatbot)) -> ChatResponse:
     """
         Handle chat requests using GraphRAG chatbot.
 
         **Args:**
         * `request` (ChatRequest): The chat request containing user ID and message.
+        * `rag` (GraphRAGChatbot): The shared chatbot instance, injected by `get_chatbot`.
 
         **Returns:**
         * `ChatResponse`: The chat response containing the generated answer.
@@ -29,9 +39,6 @@ async def chat(request: ChatRequest) -> ChatResponse:
     """
     if not request.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
-    
-        # Initialise RAG component
-    rag = GraphRAGChatbot()
 
     # TODO: Fetch message history if needed (using request.user_id)
     messages = []
@@ -54,7 +61,9 @@ async def chat(request: ChatRequest) -> ChatResponse:
     rag_response = None
     print("Performing RAG chat...")
     try:
-        rag_response = rag.chat(
+        # The chatbot is shared across requests, so keep its blocking calls off the event loop
+        rag_response = await run_in_threadpool(
+            rag.chat,
             current_query=request.message,
             messages=messages,
             roster_info=roster_info_json,
@@ -70,8 +79,66 @@ async def chat(request: ChatRequest) -> ChatResponse:
     return ChatResponse(timestamp=datetime.now().isoformat(),response="")
 
 
+@router.post("/stream")
+async def chat_stream(request: ChatRequest, rag: GraphRAGChatbot = Depends(get_chatbot)) -> StreamingResponse:
+    """
+        Handle chat requests using GraphRAG chatbot, streaming the answer as it is generated.
+
+        **Args:**
+        * `request` (ChatRequest): The chat request containing user ID and message.
+        * `rag` (GraphRAGChatbot): The shared chatbot instance, injected by `get_chatbot`.
+
+        **Returns:**
+        * `StreamingResponse`: Server-sent events, one `data: {"token": ...}` event per
+          token, followed by `data: [DONE]`.
+
+        **Raises:**
+        * `HTTPException`: If the message is empty.
+    """
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    # TODO: Fetch message history if needed (using request.user_id)
+    messages = []
+
+    person: Personnel = PERSONNELS_DATA.get(request.user_id, None)
+
+    if not person:
+        raise UserInfoRetrievalError(f"User info not found for user_id: {request.user_id}")
+
+    async def event_stream():
+        try:
+            async for token in rag.astream_chat(
+                current_query=request.message,
+                messages=messages,
+                user_info=person,
+            ):
+                yield f"data: {json.dumps({'token': token})}\n\n"
+        except RagChatbotError as e:
+            # Headers are already sent, so the error is reported in-band
+            logging.error(f"Error streaming chat response: {e}")
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.get("/history")
 async def get_chat_history():
     """Get chat history."""
     # TODO: Implement chat history retrieval
-    return {"messages": []}
\ No newline at end of file
+    return {"messages": []}
+
+@router.delete("/cache/{user_id}")
+async def invalidate_answer_cache(user_id: int, rag: GraphRAGChatbot = Depends(get_chatbot)):
+    """
+        Drop the cached answers of a user, e.g. after their roster, sleep or exercise data is updated.
+
+        **Args:**
+        * `user_id` (int): The user whose answers are dropped.
+        * `rag` (GraphRAGChatbot): The shared chatbot instance, injected by `get_chatbot`.
+
+        **Returns:**
+        * `dict`: The number of answers removed.
+    """
+    return {"user_id": user_id, "removed": rag.invalidate_user(user_id)}
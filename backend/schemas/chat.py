@@ -1,18 +1,26 @@
 import os
-from typing import Any, List, Optional, Union
+from typing import Any, AsyncGenerator, List, Optional, Union
 from pydantic import BaseModel
 from neo4j_graphrag.embeddings.base import Embedder
 from neo4j_graphrag.retrievers.base import Retriever
 from neo4j_graphrag.message_history import MessageHistory
 from neo4j_graphrag.types import LLMMessage, RetrieverResult
-from neo4j import Driver, GraphDatabase
+from neo4j import AsyncDriver, AsyncGraphDatabase, Driver, GraphDatabase
 from neo4j_graphrag.llm import OpenAILLM
-from neo4j_graphrag.retrievers import VectorCypherRetriever
-from neo4j_graphrag.embeddings.sentence_transformers import SentenceTransformerEmbeddings
+from utils.graphrag.retrievers import BatchVectorCypherRetriever
 
 from utils.graphrag.schemas import GraphRAG, RagResultModel, RagTemplate
-from utils.graphrag.helper import generic_result_formatter
-from utils.graphrag.constants import QUERY_TEMPLATE, PROMPT_TEMPLATE
+from utils.graphrag.helper import BatchResultFormatter
+from utils.graphrag.embeddings import CachedEmbedder, SharedSentenceTransformerEmbeddings
+from utils.pipelines.embeddings import TORCH, model_spec
+from utils.graphrag.summary import ConversationSummaryStore
+from utils.graphrag.context import ContextPacker
+from utils.graphrag.retrievers import AsyncVectorCypherRetriever
+from utils.graphrag.retrieval_cache import AsyncCachedRetriever, CachedRetriever, GraphVersion, RetrievalCache, EMBEDDING_VERSION_QUERY
+from utils.graphrag.ann import AsyncLocalIndexRetriever, LocalIndexRetriever, load_local_index
+from utils.graphrag.answer_cache import SemanticAnswerCache
+from backend.models.personal import Personnel
+from utils.graphrag.constants import QUERY_TEMPLATE, MATERIALIZED_QUERY_TEMPLATE, PROMPT_TEMPLATE, DEFAULT_PROMPT
 
 class ChatRequest(BaseModel):
     timestamp: str
@@ -46,40 +54,110 @@ class RagChatbotError(Exception):
 
 class GraphRAGChatbot(GraphRAG):
     driver: Driver 
-    embedder: Embedder
+    async_driver: AsyncDriver
+    embedder: CachedEmbedder
     retriever_config: Optional[dict[str, Any]] = None
     return_context: Optional[bool] = None
     response_fallback: Optional[str] = None
 
     def __init__(self):
         # Initialise Neo4j specific components for driver, embedder, retriever, llm, rag
-        driver = GraphDatabase.driver(
-            uri='neo4j+ssc://e0a0bc0d.databases.neo4j.io',
-            auth=(os.getenv('NEO4J_USERNAME',''), os.getenv('NEO4J_PASSWORD',''))
-        )
+        uri = 'neo4j+ssc://e0a0bc0d.databases.neo4j.io'
+        auth = (os.getenv('NEO4J_USERNAME',''), os.getenv('NEO4J_PASSWORD',''))
+        driver = GraphDatabase.driver(uri=uri, auth=auth)
+        # Used by astream_chat; must be created on the event loop that serves requests
+        async_driver = AsyncGraphDatabase.driver(uri=uri, auth=auth)
         try:
             driver.verify_connectivity()
             print("Connected to Neo4j database.")
         except Exception as e:
             print("Error connecting to Neo4j database:", e)
             raise e
+        # "torch", or "onnx-int8" for the model exported by `python -m utils.pipelines.embeddings export`
+        embedding_backend = os.getenv('EMBEDDING_BACKEND', TORCH)
         try: 
-            embedder=SentenceTransformerEmbeddings(model='intfloat/e5-base-v2')
+            model, model_kwargs = model_spec(
+                'intfloat/e5-base-v2',
+                backend=embedding_backend,
+                onnx_dir=os.getenv('EMBEDDING_ONNX_DIR', './models/onnx'),
+                quantization=os.getenv('EMBEDDING_ONNX_QUANTIZATION', 'avx512_vnni'),
+            )
+            embedder=CachedEmbedder(
+                SharedSentenceTransformerEmbeddings(model=model, **model_kwargs),
+                # Quantized embeddings drift slightly, so they are cached apart from the PyTorch ones
+                model_name='intfloat/e5-base-v2' if embedding_backend == TORCH else f'intfloat/e5-base-v2@{embedding_backend}',
+                max_size=int(os.getenv('EMBEDDING_CACHE_SIZE', 1024)),
+                ttl=int(os.getenv('EMBEDDING_CACHE_TTL', 3600)),
+                disk_path=os.getenv('EMBEDDING_CACHE_PATH') or None,
+            )
         except EmbedderInitializationError as e:
             print("Error initializing embedder:", e)
             raise e
         
+        # Read 2-hop neighbourhoods written by `python -m utils.graphrag.materialize refresh`
+        if os.getenv('GRAPHRAG_MATERIALIZED_NEIGHBORHOOD', 'false').lower() == 'true':
+            retrieval_query = MATERIALIZED_QUERY_TEMPLATE
+        else:
+            retrieval_query = QUERY_TEMPLATE
+
+        # Comma-separated node properties to render, empty for all of them
+        properties = [p.strip() for p in os.getenv('CONTEXT_PROPERTIES', '').split(',') if p.strip()]
+        batch_formatter = BatchResultFormatter(properties=properties or None)
         try: 
-            retriever=VectorCypherRetriever(
+            retriever=BatchVectorCypherRetriever(
                 driver=driver,
                 embedder=embedder,
-                retrieval_query=QUERY_TEMPLATE,
-                result_formatter=generic_result_formatter,
+                retrieval_query=retrieval_query,
+                batch_formatter=batch_formatter,
                 index_name='chunk_vec',
             )
+            async_retriever=AsyncVectorCypherRetriever(
+                driver=async_driver,
+                index_name='chunk_vec',
+                embedder=embedder,
+                retrieval_query=retrieval_query,
+                batch_formatter=batch_formatter,
+            )
         except RetrieverInitializationError as e:
             print("Error initializing retriever:", e)
             raise e
+
+        graph_version = GraphVersion(driver)
+        embedding_version = GraphVersion(driver, query=EMBEDDING_VERSION_QUERY)
+
+        # Snapshot written by `python -m utils.graphrag.ann export`; seeds are then found in-process
+        local_index = load_local_index(os.getenv('LOCAL_ANN_PATH', ''))
+        if local_index is not None:
+            retriever = LocalIndexRetriever(
+                index=local_index,
+                driver=driver,
+                embedder=embedder,
+                retrieval_query=retrieval_query,
+                fallback=retriever,
+                embedding_version=embedding_version,
+                batch_formatter=batch_formatter,
+            )
+            async_retriever = AsyncLocalIndexRetriever(
+                index=local_index,
+                driver=async_driver,
+                embedder=embedder,
+                retrieval_query=retrieval_query,
+                fallback=async_retriever,
+                embedding_version=embedding_version,
+                batch_formatter=batch_formatter,
+            )
+
+        # Shared with the pipelines server when both point RETRIEVAL_CACHE_PATH at the same file
+        retrieval_cache = RetrievalCache(
+            graph_version=graph_version,
+            index_name='chunk_vec',
+            retrieval_query=retrieval_query,
+            path=os.getenv('RETRIEVAL_CACHE_PATH') or None,
+            max_size=int(os.getenv('RETRIEVAL_CACHE_SIZE', 1000)),
+            ttl=int(os.getenv('RETRIEVAL_CACHE_TTL', 3600)),
+        )
+        retriever = CachedRetriever(retriever, retrieval_cache)
+        async_retriever = AsyncCachedRetriever(async_retriever, retrieval_cache)
         
         llm=OpenAILLM(
             model_name=os.getenv('DOCUMENT_RAG_MODEL','gpt-5.2')
@@ -90,14 +168,59 @@ class GraphRAGChatbot(GraphRAG):
             expected_inputs=['context', 'query_text', 'roster_info', 'exercise_info', 'sleep_info']
         )
 
-        super().__init__(retriever, llm, prompt_template)
+        summary_store = ConversationSummaryStore(
+            min_turns=int(os.getenv('SUMMARY_MIN_TURNS', 6)),
+            min_tokens=int(os.getenv('SUMMARY_MIN_TOKENS', 1500)),
+        )
+
+        super().__init__(
+            retriever,
+            llm,
+            prompt_template,
+            summary_store,
+            concurrent=os.getenv('GRAPHRAG_CONCURRENT_SEARCH', 'false').lower() == 'true',
+            requery_threshold=float(os.getenv('GRAPHRAG_REQUERY_THRESHOLD', 0.9)),
+            async_retriever=async_retriever,
+            context_packer=ContextPacker(max_tokens=int(os.getenv('CONTEXT_MAX_TOKENS', 4000))),
+            # Reuse answers to similar first questions with the same user context; size 0 disables
+            answer_cache=SemanticAnswerCache(
+                threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.95)),
+                max_size=int(os.getenv('ANSWER_CACHE_SIZE', 1000)),
+                ttl=int(os.getenv('ANSWER_CACHE_TTL', 3600)),
+            ) if int(os.getenv('ANSWER_CACHE_SIZE', 1000)) > 0 else None,
+            # Concurrent-mode searches that can run at once before requests queue for workers
+            max_concurrent_searches=int(os.getenv('GRAPHRAG_MAX_CONCURRENT_SEARCHES', 8)),
+        )
+        self.driver = driver
+        self.async_driver = async_driver
+        self.retrieval_cache = retrieval_cache
         self.embedder = embedder
         self.retriever_config = {
                 "query_params": { # Cypher query parameters
                     "limit": 100,
                     },
         }
-        
+
+    def warm_up(self) -> None:
+        """Run a throwaway embedding so the first request does not pay for model initialisation."""
+        self.embedder.embed_query(DEFAULT_PROMPT)
+
+    async def aclose(self) -> None:
+        """Close the Neo4j drivers, caches and search workers held by this chatbot."""
+        if self.async_driver:
+            await self.async_driver.close()
+        if self.driver:
+            self.driver.close()
+        self.embedder.close()
+        self.retrieval_cache.close()
+        self.close()
+
+    def invalidate_user(self, user_id: int) -> int:
+        """Drop the cached answers of a user whose roster, sleep or exercise data changed."""
+        if self.answer_cache is None:
+            return 0
+        return self.answer_cache.invalidate(user_id)
+
     def chat(self, 
             current_query: str, 
             messages: List[dict] = [],
@@ -120,3 +243,19 @@ class GraphRAGChatbot(GraphRAG):
         )
     
 
+    def astream_chat(
+            self,
+            current_query: str,
+            messages: List[dict] = [],
+            user_info: Optional[Personnel] = None,
+            ) -> AsyncGenerator[str, None]:
+        """Perform a RAG search and stream the response tokens as they are generated."""
+
+        message_history = [LLMMessage(**msg) for msg in messages] if messages else []
+
+        return super().asearch(
+            query_text=current_query,
+            message_history=message_history,
+            user_info=user_info,
+            retriever_config=self.retriever_config
+        )
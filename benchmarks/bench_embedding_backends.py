@@ -0,0 +1,59 @@
+"""
+Throughput of the PyTorch and int8 ONNX embedding backends across batch sizes.
+
+Needs the quantized model exported first:
+
+    python -m utils.pipelines.embeddings export intfloat/e5-large-v2
+
+Run from the repository root:
+
+    python -m benchmarks.bench_embedding_backends --model intfloat/e5-large-v2 --batch-sizes 1 8 32 64
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from sentence_transformers import SentenceTransformer
+
+from utils.pipelines.embeddings import ONNX_INT8, PARITY_TEXTS, TORCH, model_spec
+
+
+def bench(model: SentenceTransformer, texts, batch_size: int, rounds: int):
+    batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+    model.encode(batch, batch_size=batch_size)  # warm-up
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        model.encode(batch, batch_size=batch_size)
+        latencies.append(time.perf_counter() - start)
+    median = statistics.median(latencies)
+    return median, batch_size / median
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="intfloat/e5-large-v2")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--onnx-dir", default=os.getenv("EMBEDDING_ONNX_DIR", "./models/onnx"))
+    parser.add_argument("--quantization", default=os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx512_vnni"))
+    args = parser.parse_args()
+
+    models = {}
+    for backend in (TORCH, ONNX_INT8):
+        name, kwargs = model_spec(args.model, backend, args.onnx_dir, args.quantization)
+        models[backend] = SentenceTransformer(name, device="cpu", **kwargs)
+
+    print(f"{args.model}, median of {args.rounds} rounds")
+    print(f"{'batch':>5}  {'backend':<9} {'latency ms':>11} {'texts/s':>9}  speed-up")
+    for batch_size in args.batch_sizes:
+        baseline = None
+        for backend, model in models.items():
+            latency, throughput = bench(model, PARITY_TEXTS, batch_size, args.rounds)
+            baseline = baseline or throughput
+            print(
+                f"{batch_size:>5}  {backend:<9} {latency * 1e3:>11.2f} {throughput:>9.1f}  "
+                f"{throughput / baseline:.2f}x"
+            )
@@ -0,0 +1,66 @@
+"""
+Query embedding throughput under concurrency, with and without EmbeddingBatcher.
+
+Each of --concurrency threads embeds one query at a time, as concurrent pipe
+calls do; the direct mode calls `encode` per query, the batched mode goes through
+an EmbeddingBatcher that coalesces them.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_embedding_batcher --model intfloat/e5-base-v2 --concurrency 16
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+from sentence_transformers import SentenceTransformer
+
+from utils.pipelines.embeddings import PARITY_TEXTS, EmbeddingBatcher
+
+
+def run(embed, concurrency: int, queries: int):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset: int):
+        for i in range(queries):
+            start = time.perf_counter()
+            embed(PARITY_TEXTS[(offset + i) % len(PARITY_TEXTS)])
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="intfloat/e5-base-v2")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=20, help="queries per thread")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model, device="cpu")
+    model.encode(PARITY_TEXTS)  # warm-up
+    batcher = EmbeddingBatcher(model, args.model, args.batch_size, args.wait_ms / 1000)
+
+    modes = {
+        "direct": lambda text: model.encode([text])[0].tolist(),
+        "batched": batcher.encode,
+    }
+    print(f"{args.model}, {args.concurrency} threads x {args.queries} queries")
+    for mode, embed in modes.items():
+        throughput, median, p95 = run(embed, args.concurrency, args.queries)
+        print(f"{mode:<8} {throughput:8.1f} queries/s  median {median * 1e3:7.2f} ms  p95 {p95 * 1e3:7.2f} ms")
+    batcher.close()
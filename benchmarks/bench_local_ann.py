@@ -0,0 +1,78 @@
+"""
+Benchmark for the in-process seed search of `utils.graphrag.ann`.
+
+Writes a synthetic snapshot (random unit vectors) and measures LocalVectorIndex
+search latency with the exact NumPy scan and, when hnswlib is installed, with
+the HNSW graph, reporting HNSW recall@k against the exact result.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_local_ann --vectors 100000 --dimensions 768
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from utils.graphrag import ann
+
+
+def write_snapshot(directory: str, n: int, dimensions: int, build_hnsw: bool, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = ann._normalize(rng.standard_normal((n, dimensions), dtype=np.float32))
+    vectors.tofile(os.path.join(directory, ann.VECTORS_FILENAME))
+    with open(os.path.join(directory, ann.IDS_FILENAME), "w") as f:
+        json.dump([f"4:abc:{i}" for i in range(n)], f)
+    if build_hnsw:
+        index = ann.hnswlib.Index(space="ip", dim=dimensions)
+        index.init_index(max_elements=n, ef_construction=200, M=16)
+        index.add_items(vectors, np.arange(n))
+        index.save_index(os.path.join(directory, ann.HNSW_FILENAME))
+    with open(os.path.join(directory, ann.META_FILENAME), "w") as f:
+        json.dump({"count": n, "dimensions": dimensions, "embedding_version": 0, "hnsw": build_hnsw}, f)
+    return rng
+
+
+def bench(index: ann.LocalVectorIndex, queries, top_k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search(query, top_k))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_hnsw = ann.hnswlib is not None
+        rng = write_snapshot(directory, args.vectors, args.dimensions, use_hnsw)
+        queries = [q.tolist() for q in rng.standard_normal((args.queries, args.dimensions), dtype=np.float32)]
+
+        index = ann.LocalVectorIndex(directory)
+        hnsw, index.hnsw = index.hnsw, None
+        median, p95, exact = bench(index, queries, args.top_k)
+        print(f"{args.vectors} x {args.dimensions}, top_k={args.top_k}")
+        print(f"exact  median {median * 1e3:7.3f} ms  p95 {p95 * 1e3:7.3f} ms")
+
+        if hnsw is None:
+            print("hnswlib not installed; skipping HNSW")
+        else:
+            index.hnsw = hnsw
+            median, p95, approximate = bench(index, queries, args.top_k)
+            recall = statistics.mean(
+                len({i for i, _ in a} & {i for i, _ in e}) / args.top_k for a, e in zip(approximate, exact)
+            )
+            print(f"hnsw   median {median * 1e3:7.3f} ms  p95 {p95 * 1e3:7.3f} ms  recall@{args.top_k} {recall:.3f}")
@@ -0,0 +1,86 @@
+"""
+Compares the live 2-hop traversal (QUERY_TEMPLATE) with the materialized
+neighbourhood lookup (MATERIALIZED_QUERY_TEMPLATE) on a real Neo4j database.
+
+For each query it reports the total db hits from PROFILE and the median / p95
+latency over several runs, and checks both return the same nodes. Materialize
+first:
+
+    python -m utils.graphrag.materialize refresh
+
+Then, from the repository root (NEO4J_URI / NEO4J_USERNAME / NEO4J_PASSWORD set):
+
+    python -m benchmarks.bench_materialized_query --runs 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+from neo4j import GraphDatabase
+
+from utils.graphrag.constants import DEFAULT_PROMPT, MATERIALIZED_QUERY_TEMPLATE, QUERY_TEMPLATE
+from utils.graphrag.retrievers import VECTOR_SEARCH_QUERY
+
+
+def total_db_hits(profile: dict) -> int:
+    return profile.get("dbHits", 0) + sum(total_db_hits(child) for child in profile.get("children", []))
+
+
+def query_vector(text: str, dimensions: int, use_random: bool):
+    if use_random:
+        return [random.uniform(-1, 1) for _ in range(dimensions)]
+    from neo4j_graphrag.embeddings.sentence_transformers import SentenceTransformerEmbeddings
+
+    return SentenceTransformerEmbeddings(model="intfloat/e5-base-v2").embed_query(text)
+
+
+def bench(driver, template: str, parameters: dict, runs: int):
+    query = f"{VECTOR_SEARCH_QUERY}{template}"
+    records, summary, _ = driver.execute_query(f"PROFILE {query}", parameters)
+    db_hits = total_db_hits(summary.profile)
+
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        driver.execute_query(query, parameters)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return {record["node"].element_id for record in records}, db_hits, statistics.median(latencies), p95
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", default=DEFAULT_PROMPT)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--index", default="chunk_vec")
+    parser.add_argument("--random", action="store_true", help="use a random 768-d vector instead of embedding --query")
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(
+        uri=os.getenv("NEO4J_URI", "neo4j+s://e0a0bc0d.databases.neo4j.io"),
+        auth=(os.getenv("NEO4J_USERNAME", ""), os.getenv("NEO4J_PASSWORD", "")),
+    )
+    parameters = {
+        "vector_index_name": args.index,
+        "top_k": args.top_k,
+        "query_vector": query_vector(args.query, 768, args.random),
+        "limit": args.limit,
+    }
+
+    with driver:
+        results = {}
+        for name, template in (("live traversal", QUERY_TEMPLATE), ("materialized", MATERIALIZED_QUERY_TEMPLATE)):
+            nodes, db_hits, median, p95 = bench(driver, template, parameters, args.runs)
+            results[name] = nodes
+            print(f"{name:<16} {len(nodes):4d} nodes  {db_hits:9d} db hits  "
+                  f"median {median * 1e3:8.2f} ms  p95 {p95 * 1e3:8.2f} ms")
+
+    if results["live traversal"] != results["materialized"]:
+        # Also possible when nodes tie on (seed_score, hop_distance) at the LIMIT
+        print("WARNING: results differ; the materialization may be stale (run `materialize refresh`)")
@@ -0,0 +1,97 @@
+"""
+Microbenchmark for GraphRAG result formatting.
+
+Compares calling `generic_result_formatter` once per record with
+`BatchResultFormatter.format_batch` over the whole result set, on synthetic
+records shaped like QUERY_TEMPLATE rows (node, label, seed_score, hop_distance).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_result_formatter --records 100 --properties 30
+"""
+
+import argparse
+import time
+
+from utils.graphrag.helper import BatchResultFormatter, generic_result_formatter
+
+
+class FakeNode(dict):
+    """Quacks like neo4j.graph.Node for the formatters: labels, element_id, mapping of properties."""
+
+    def __init__(self, element_id: str, labels, properties: dict):
+        super().__init__(properties)
+        self.element_id = element_id
+        self.labels = frozenset(labels)
+
+
+class FakeRecord:
+    """Quacks like neo4j.Record: keys(), values(), get()."""
+
+    def __init__(self, data: dict):
+        self._data = data
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def values(self):
+        return list(self._data.values())
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+
+def make_records(n: int, n_properties: int, distinct: int):
+    nodes = [
+        FakeNode(
+            f"4:abc:{i}",
+            ["sop"],
+            {f"prop_{j}": f"value {i}-{j} " * 4 for j in range(n_properties)},
+        )
+        for i in range(distinct)
+    ]
+    return [
+        FakeRecord(
+            {
+                "node": nodes[i % distinct],
+                "chosen_first_hop_label": "sop",
+                "seed_score": 0.9 - i / 1000,
+                "hop_distance": 1 + i % 3,
+            }
+        )
+        for i in range(n)
+    ]
+
+
+def bench(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100)
+    parser.add_argument("--properties", type=int, default=30)
+    parser.add_argument("--distinct", type=int, default=0, help="distinct nodes (default: one per record)")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.properties, args.distinct or args.records)
+    batch = BatchResultFormatter()
+    allow_listed = BatchResultFormatter(properties=["prop_0", "prop_1", "prop_2"])
+
+    # Same output as the per-record formatter when no allow-list is set
+    expected = [generic_result_formatter(record) for record in records]
+    assert [item.content for item in batch.format_batch(records)] == [item.content for item in expected]
+    assert [item.metadata for item in batch.format_batch(records)] == [item.metadata for item in expected]
+
+    baseline = bench(lambda: [generic_result_formatter(record) for record in records], args.rounds)
+    batched = bench(lambda: batch.format_batch(records), args.rounds)
+    limited = bench(lambda: allow_listed.format_batch(records), args.rounds)
+
+    print(f"{args.records} records, {args.properties} properties, {args.distinct or args.records} distinct nodes")
+    print(f"generic_result_formatter      {baseline * 1e3:8.3f} ms/batch")
+    print(f"BatchResultFormatter          {batched * 1e3:8.3f} ms/batch  ({baseline / batched:.1f}x)")
+    print(f"BatchResultFormatter (3 props){limited * 1e3:8.3f} ms/batch  ({baseline / limited:.1f}x)")
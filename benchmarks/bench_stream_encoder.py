@@ -0,0 +1,59 @@
+"""
+Microbenchmark for SSE chunk encoding.
+
+Compares the per-token `stream_message_template` + `json.dumps` path with
+`StreamEncoder`, with and without token coalescing.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_stream_encoder --tokens 200000
+"""
+
+import argparse
+import json
+import time
+
+from utils.pipelines.main import StreamEncoder, stream_message_template
+
+
+MODEL = "graph_rag"
+TOKENS = ["The", " quick", " brown", " fox", " jumps", " over", " the", " lazy", " dog", ".\n"]
+
+
+def bench_template(n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        line = stream_message_template(MODEL, TOKENS[i % len(TOKENS)])
+        f"data: {json.dumps(line)}\n\n".encode()
+    return time.perf_counter() - start
+
+
+def bench_encoder(n: int, flush_bytes: int = 0) -> float:
+    encoder = StreamEncoder(MODEL, flush_bytes=flush_bytes)
+    start = time.perf_counter()
+    for i in range(n):
+        encoder.push(TOKENS[i % len(TOKENS)])
+    encoder.flush()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=200_000)
+    parser.add_argument("--flush-bytes", type=int, default=64)
+    args = parser.parse_args()
+
+    results = {
+        "stream_message_template": bench_template(args.tokens),
+        "StreamEncoder": bench_encoder(args.tokens),
+        f"StreamEncoder(flush_bytes={args.flush_bytes})": bench_encoder(
+            args.tokens, flush_bytes=args.flush_bytes
+        ),
+    }
+
+    baseline = results["stream_message_template"]
+    for name, elapsed in results.items():
+        print(
+            f"{name:<36} {args.tokens / elapsed:>12,.0f} chunks/s"
+            f"  ({baseline / elapsed:.1f}x)"
+        )
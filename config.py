@@ -22,3 +22,18 @@ LOG_LEVELS = {
 
 API_KEY = os.getenv("PIPELINES_API_KEY", "0p3n-w3bu!")
 PIPELINES_DIR = os.getenv("PIPELINES_DIR", "./pipelines")
+
+# Maximum number of pipelines imported / started at the same time
+PIPELINES_STARTUP_CONCURRENCY = int(os.getenv("PIPELINES_STARTUP_CONCURRENCY", "4"))
+
+# Coalesce streamed tokens into one SSE frame until this many seconds / bytes
+# have accumulated. 0 disables the threshold; both 0 sends every token as is.
+PIPELINES_STREAM_FLUSH_INTERVAL = float(os.getenv("PIPELINES_STREAM_FLUSH_INTERVAL", "0"))
+PIPELINES_STREAM_FLUSH_BYTES = int(os.getenv("PIPELINES_STREAM_FLUSH_BYTES", "0"))
+
+# Default admission limits per pipeline; a pipeline can override them with
+# MAX_CONCURRENCY / MAX_QUEUE valves. Requests beyond both get a 503 with
+# Retry-After set to PIPELINES_RETRY_AFTER seconds.
+PIPELINES_MAX_CONCURRENCY = int(os.getenv("PIPELINES_MAX_CONCURRENCY", "8"))
+PIPELINES_MAX_QUEUE = int(os.getenv("PIPELINES_MAX_QUEUE", "32"))
+PIPELINES_RETRY_AFTER = int(os.getenv("PIPELINES_RETRY_AFTER", "1"))
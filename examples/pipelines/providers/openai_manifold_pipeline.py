@@ -1,5 +1,6 @@
 from typing import List, Union, Generator, Iterator
 from schemas import OpenAIChatMessage
+from utils.pipelines.cancel import current_cancel_token
 from pydantic import BaseModel
 
 import os
@@ -123,6 +124,8 @@ class Pipeline:
             r.raise_for_status()
 
             if body["stream"]:
+                # Closing the response aborts the upstream generation if the client disconnects
+                current_cancel_token().on_cancel(r.close)
                 return r.iter_lines()
             else:
                 return r.json()
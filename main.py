@@ -1,16 +1,26 @@
 from fastapi import FastAPI, Request, Depends, status, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.concurrency import run_in_threadpool
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
 
 
 from starlette.responses import StreamingResponse, Response
 from pydantic import BaseModel, ConfigDict
-from typing import List, Union, Generator, Iterator
+from typing import List, Union, Generator, Iterator, AsyncGenerator, AsyncIterator
 
 
 from utils.pipelines.auth import bearer_security, get_current_user
-from utils.pipelines.main import get_last_user_message, stream_message_template
+from utils.pipelines.main import get_last_user_message, StreamEncoder
 from utils.pipelines.misc import convert_to_raw_url
+from utils.pipelines.cancel import CancelToken, ThreadedIterator, set_cancel_token
+from utils.pipelines.executors import PipelineLimiters, PipelineOverloaded
+from utils.pipelines.embeddings import EMBEDDING_MODELS
+from utils.pipelines.metrics import METRICS
+from utils.pipelines.requirements import ensure_requirements
+from utils.pipelines.registry import (
+    PipelineRegistry,
+    diff_pipeline_files,
+    scan_pipeline_files,
+)
 
 from contextlib import asynccontextmanager
 from concurrent.futures import ThreadPoolExecutor
@@ -19,25 +29,100 @@ from urllib.parse import urlparse
 
 import shutil
 import aiohttp
+import anyio
+import asyncio
+import contextvars
+import functools
 import os
 import importlib.util
+import inspect
 import logging
 import time
 import json
 import uuid
-import sys
-import subprocess
-
-
-from config import API_KEY, PIPELINES_DIR, LOG_LEVELS
+import weakref
+
+
+from config import (
+    API_KEY,
+    PIPELINES_DIR,
+    PIPELINES_MAX_CONCURRENCY,
+    PIPELINES_MAX_QUEUE,
+    PIPELINES_RETRY_AFTER,
+    PIPELINES_STARTUP_CONCURRENCY,
+    PIPELINES_STREAM_FLUSH_BYTES,
+    PIPELINES_STREAM_FLUSH_INTERVAL,
+    LOG_LEVELS,
+)
 
 if not os.path.exists(PIPELINES_DIR):
     os.makedirs(PIPELINES_DIR)
 
 
-PIPELINES = {}
 PIPELINE_MODULES = {}
 PIPELINE_NAMES = {}
+# Module name -> state of the source file it was loaded from, used to diff on reload
+PIPELINE_FILES = {}
+# Module name -> import/on_startup timings of the last load
+STARTUP_REPORT = {}
+# Per-pipeline concurrency limits, queues and thread pools
+LIMITERS = PipelineLimiters(PIPELINES_MAX_CONCURRENCY, PIPELINES_MAX_QUEUE)
+# Streams stopped because the client disconnected
+STREAM_STATS = {
+    "cancelled_streams": 0,
+    "chunks_before_cancel": 0,
+    "estimated_tokens_saved": 0,
+}
+
+# Metrics served on /metrics
+REQUEST_LATENCY = METRICS.histogram(
+    "pipelines_request_duration_seconds",
+    "HTTP request latency, up to the response headers.",
+    ["method", "route", "status"],
+)
+TIME_TO_FIRST_TOKEN = METRICS.histogram(
+    "pipelines_time_to_first_token_seconds",
+    "Time from calling the pipe to its first streamed chunk.",
+    ["pipeline"],
+)
+TOKENS_PER_SECOND = METRICS.histogram(
+    "pipelines_tokens_per_second",
+    "Streamed chunks per second after the first one; one chunk is about one token.",
+    ["pipeline"],
+    buckets=(1, 5, 10, 25, 50, 100, 200, 500, 1000),
+)
+FILTER_DURATION = METRICS.histogram(
+    "pipelines_filter_duration_seconds",
+    "Duration of filter inlet/outlet calls.",
+    ["pipeline", "stage"],
+)
+PIPE_DURATION = METRICS.histogram(
+    "pipelines_pipe_duration_seconds",
+    "Pipe duration, from the call to the last streamed chunk.",
+    ["pipeline"],
+)
+ERRORS = METRICS.counter(
+    "pipelines_errors_total",
+    "Failed requests by pipeline and stage (admission, inlet, pipe, outlet).",
+    ["pipeline", "stage"],
+)
+STREAM_CANCELLATIONS = METRICS.counter(
+    "pipelines_stream_cancellations_total",
+    "Streams stopped because the client disconnected.",
+    ["pipeline"],
+)
+METRICS.gauge(
+    "pipelines_active_requests",
+    "Requests currently running per pipeline.",
+    ["pipeline"],
+    collect=lambda: {(pipeline_id,): s["active"] for pipeline_id, s in LIMITERS.stats().items()},
+)
+METRICS.gauge(
+    "pipelines_queued_requests",
+    "Requests waiting for a slot per pipeline.",
+    ["pipeline"],
+    collect=lambda: {(pipeline_id,): s["waiting"] for pipeline_id, s in LIMITERS.stats().items()},
+)
 
 # Add GLOBAL_LOG_LEVEL for Pipeplines
 log_level = os.getenv("GLOBAL_LOG_LEVEL", "INFO").upper()
@@ -111,44 +196,19 @@ def get_all_pipelines():
     return pipelines
 
 
-def parse_frontmatter(content):
-    frontmatter = {}
-    for line in content.split("\n"):
-        if ":" in line:
-            key, value = line.split(":", 1)
-            frontmatter[key.strip().lower()] = value.strip()
-    return frontmatter
+# Cached view of get_all_pipelines(), rebuilt only when pipelines or valves change
+REGISTRY = PipelineRegistry(get_all_pipelines)
 
 
-def install_frontmatter_requirements(requirements):
-    if requirements:
-        req_list = [req.strip() for req in requirements.split(",")]
-        for req in req_list:
-            print(f"Installing requirement: {req}")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", req])
-    else:
-        print("No requirements found in frontmatter.")
+async def load_module_from_path(module_name, module_path):
+    # Importing runs module-level code and Pipeline(), which may load models
+    return await asyncio.to_thread(import_module_from_path, module_name, module_path)
 
 
-async def load_module_from_path(module_name, module_path):
+def import_module_from_path(module_name, module_path):
 
     try:
-        # Read the module content
-        with open(module_path, "r") as file:
-            content = file.read()
-
-        # Parse frontmatter
-        frontmatter = {}
-        if content.startswith('"""'):
-            end = content.find('"""', 3)
-            if end != -1:
-                frontmatter_content = content[3:end]
-                frontmatter = parse_frontmatter(frontmatter_content)
-
-        # Install requirements if specified
-        if "requirements" in frontmatter:
-            install_frontmatter_requirements(frontmatter["requirements"])
-
+        # Frontmatter requirements are installed beforehand by ensure_requirements()
         # Load the module
         spec = importlib.util.spec_from_file_location(module_name, module_path)
         module = importlib.util.module_from_spec(spec)
@@ -172,63 +232,192 @@ async def load_module_from_path(module_name, module_path):
     return None
 
 
+async def load_pipeline(directory, module_name):
+    """
+    Imports a single pipeline file and applies its valves.json.
+    Returns the Pipeline instance, or None if the file could not be loaded.
+    """
+    module_path = os.path.join(directory, f"{module_name}.py")
+
+    # Create subfolder matching the filename without the .py extension
+    subfolder_path = os.path.join(directory, module_name)
+    if not os.path.exists(subfolder_path):
+        os.makedirs(subfolder_path)
+        logging.info(f"Created subfolder: {subfolder_path}")
+
+    # Create a valves.json file if it doesn't exist
+    valves_json_path = os.path.join(subfolder_path, "valves.json")
+    if not os.path.exists(valves_json_path):
+        with open(valves_json_path, "w") as f:
+            json.dump({}, f)
+        logging.info(f"Created valves.json in: {subfolder_path}")
+
+    start_time = time.perf_counter()
+    pipeline = await load_module_from_path(module_name, module_path)
+    STARTUP_REPORT[module_name] = {
+        "pipeline_id": None,
+        "import_seconds": round(time.perf_counter() - start_time, 3),
+        "startup_seconds": None,
+        "status": "loaded" if pipeline else "failed",
+        "error": None if pipeline else "could not be loaded",
+    }
+
+    if pipeline:
+        # Overwrite pipeline.valves with values from valves.json
+        if os.path.exists(valves_json_path):
+            with open(valves_json_path, "r") as f:
+                valves_json = json.load(f)
+                if hasattr(pipeline, "valves"):
+                    ValvesModel = pipeline.valves.__class__
+                    # Create a ValvesModel instance using default values and overwrite with valves_json
+                    combined_valves = {
+                        **pipeline.valves.model_dump(),
+                        **valves_json,
+                    }
+                    valves = ValvesModel(**combined_valves)
+                    pipeline.valves = valves
+
+                    logging.info(f"Updated valves for module: {module_name}")
+        return pipeline
+    else:
+        logging.warning(f"No Pipeline class found in {module_name}")
+    return None
+
+
+def register_pipeline(module_name, pipeline):
+    pipeline_id = pipeline.id if hasattr(pipeline, "id") else module_name
+    PIPELINE_MODULES[pipeline_id] = pipeline
+    PIPELINE_NAMES[pipeline_id] = module_name
+    STARTUP_REPORT[module_name]["pipeline_id"] = pipeline_id
+    logging.info(f"Loaded module: {module_name}")
+    return pipeline_id
+
+
+async def gather_bounded(*aws):
+    """Awaits `aws` concurrently, at most PIPELINES_STARTUP_CONCURRENCY at a time."""
+    semaphore = asyncio.Semaphore(PIPELINES_STARTUP_CONCURRENCY)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
+
+async def run_startup_hook(module_name, pipeline):
+    if not hasattr(pipeline, "on_startup"):
+        return
+
+    start_time = time.perf_counter()
+    try:
+        # Hooks run on the serving loop, so the async clients they create stay usable.
+        # Blocking work (model loading, store setup) must go through asyncio.to_thread
+        # inside the hook, or it serialises the other pipelines' hooks.
+        await pipeline.on_startup()
+        STARTUP_REPORT[module_name]["status"] = "started"
+    except Exception as e:
+        STARTUP_REPORT[module_name]["status"] = "startup_failed"
+        STARTUP_REPORT[module_name]["error"] = str(e)
+        raise
+    finally:
+        STARTUP_REPORT[module_name]["startup_seconds"] = round(
+            time.perf_counter() - start_time, 3
+        )
+
+
 async def load_modules_from_directory(directory):
-    global PIPELINE_MODULES
-    global PIPELINE_NAMES
-
-    for filename in os.listdir(directory):
-        if filename.endswith(".py"):
-            module_name = filename[:-3]  # Remove the .py extension
-            module_path = os.path.join(directory, filename)
-
-            # Create subfolder matching the filename without the .py extension
-            subfolder_path = os.path.join(directory, module_name)
-            if not os.path.exists(subfolder_path):
-                os.makedirs(subfolder_path)
-                logging.info(f"Created subfolder: {subfolder_path}")
-
-            # Create a valves.json file if it doesn't exist
-            valves_json_path = os.path.join(subfolder_path, "valves.json")
-            if not os.path.exists(valves_json_path):
-                with open(valves_json_path, "w") as f:
-                    json.dump({}, f)
-                logging.info(f"Created valves.json in: {subfolder_path}")
-
-            pipeline = await load_module_from_path(module_name, module_path)
-            if pipeline:
-                # Overwrite pipeline.valves with values from valves.json
-                if os.path.exists(valves_json_path):
-                    with open(valves_json_path, "r") as f:
-                        valves_json = json.load(f)
-                        if hasattr(pipeline, "valves"):
-                            ValvesModel = pipeline.valves.__class__
-                            # Create a ValvesModel instance using default values and overwrite with valves_json
-                            combined_valves = {
-                                **pipeline.valves.model_dump(),
-                                **valves_json,
-                            }
-                            valves = ValvesModel(**combined_valves)
-                            pipeline.valves = valves
-
-                            logging.info(f"Updated valves for module: {module_name}")
-
-                pipeline_id = pipeline.id if hasattr(pipeline, "id") else module_name
-                PIPELINE_MODULES[pipeline_id] = pipeline
-                PIPELINE_NAMES[pipeline_id] = module_name
-                logging.info(f"Loaded module: {module_name}")
-            else:
-                logging.warning(f"No Pipeline class found in {module_name}")
-
-    global PIPELINES
-    PIPELINES = get_all_pipelines()
+    files = scan_pipeline_files(directory)
+
+    module_names = list(files.keys())
+    await asyncio.to_thread(ensure_requirements, directory, module_names)
+
+    pipelines = await gather_bounded(
+        *(load_pipeline(directory, module_name) for module_name in module_names)
+    )
+
+    # Register in directory order so /models stays stable across restarts
+    for module_name, pipeline in zip(module_names, pipelines):
+        if pipeline:
+            register_pipeline(module_name, pipeline)
+            PIPELINE_FILES[module_name] = files[module_name]
+
+    REGISTRY.rebuild()
+
+
+def get_module_pipeline_ids(module_name):
+    return [
+        pipeline_id
+        for pipeline_id, name in PIPELINE_NAMES.items()
+        if name == module_name
+    ]
+
+
+def unregister_module(module_name):
+    """Removes the pipelines of a module from the server; returns their instances."""
+    pipelines = []
+    for pipeline_id in get_module_pipeline_ids(module_name):
+        pipelines.append(PIPELINE_MODULES.pop(pipeline_id))
+        PIPELINE_NAMES.pop(pipeline_id, None)
+        LIMITERS.discard(pipeline_id)
+    return pipelines
+
+
+async def start_pipeline(module_name, file):
+    """
+    Loads and starts a pipeline module. Returns False if it could not be loaded or
+    its on_startup raised; it is then left unregistered and untracked, so the next
+    reload retries it.
+    """
+    pipeline = await load_pipeline(PIPELINES_DIR, module_name)
+    if pipeline is None:
+        return False
+
+    register_pipeline(module_name, pipeline)
+    try:
+        await run_startup_hook(module_name, pipeline)
+    except Exception:
+        logging.exception(f"Error starting pipeline {module_name}")
+        unregister_module(module_name)
+        return False
+    PIPELINE_FILES[module_name] = file
+    return True
+
+
+def startup_errors(module_names):
+    return {
+        module_name: STARTUP_REPORT.get(module_name, {}).get("error")
+        for module_name in module_names
+    }
+
+
+async def stop_pipeline(module_name):
+    for pipeline in unregister_module(module_name):
+        if hasattr(pipeline, "on_shutdown"):
+            await pipeline.on_shutdown()
+
+    PIPELINE_FILES.pop(module_name, None)
+    STARTUP_REPORT.pop(module_name, None)
 
 
 async def on_startup():
+    start_time = time.perf_counter()
     await load_modules_from_directory(PIPELINES_DIR)
 
-    for module in PIPELINE_MODULES.values():
-        if hasattr(module, "on_startup"):
-            await module.on_startup()
+    await gather_bounded(
+        *(
+            run_startup_hook(PIPELINE_NAMES[pipeline_id], module)
+            for pipeline_id, module in PIPELINE_MODULES.items()
+        )
+    )
+    # Manifolds may only fill in their pipelines from on_startup
+    REGISTRY.rebuild()
+
+    for module_name, report in STARTUP_REPORT.items():
+        logging.info(
+            f"Pipeline {module_name}: status={report['status']} "
+            f"import={report['import_seconds']}s startup={report['startup_seconds']}s"
+        )
+    logging.info(f"Pipelines started in {time.perf_counter() - start_time:.3f}s")
 
 
 async def on_shutdown():
@@ -238,15 +427,65 @@ async def on_shutdown():
 
 
 async def reload():
+    """
+    Reloads only the pipeline files that were added, changed or removed since
+    they were last loaded. Unchanged pipelines keep running untouched.
+    """
+    current = scan_pipeline_files(PIPELINES_DIR, PIPELINE_FILES)
+    added, changed, removed = diff_pipeline_files(PIPELINE_FILES, current)
+
+    for module_name in removed + changed:
+        await stop_pipeline(module_name)
+
+    try:
+        await asyncio.to_thread(ensure_requirements, PIPELINES_DIR, changed + added)
+        started = await gather_bounded(
+            *(
+                start_pipeline(module_name, current[module_name])
+                for module_name in changed + added
+            )
+        )
+    finally:
+        REGISTRY.rebuild()
+
+    failed = startup_errors(
+        module_name for module_name, ok in zip(changed + added, started) if not ok
+    )
+    logging.info(
+        f"Reloaded pipelines: added={added} changed={changed} removed={removed} failed={list(failed)}"
+    )
+    return {"added": added, "changed": changed, "removed": removed, "failed": failed}
+
+
+async def reload_all():
     await on_shutdown()
     # Clear existing pipelines
-    PIPELINES.clear()
     PIPELINE_MODULES.clear()
     PIPELINE_NAMES.clear()
+    PIPELINE_FILES.clear()
+    STARTUP_REPORT.clear()
     # Load pipelines afresh
     await on_startup()
 
 
+async def reload_module(module_name):
+    """
+    Restarts a single pipeline module, even if its file did not change.
+    Returns False if it is gone or failed to start.
+    """
+    await stop_pipeline(module_name)
+
+    started = False
+    try:
+        current = scan_pipeline_files(PIPELINES_DIR, PIPELINE_FILES)
+        if module_name in current:
+            await asyncio.to_thread(ensure_requirements, PIPELINES_DIR, [module_name])
+            started = await start_pipeline(module_name, current[module_name])
+    finally:
+        REGISTRY.rebuild()
+    return started
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await on_startup()
@@ -256,7 +495,7 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(docs_url="/docs", redoc_url=None, lifespan=lifespan)
 
-app.state.PIPELINES = PIPELINES
+app.state.registry = REGISTRY
 
 
 origins = ["*"]
@@ -273,11 +512,16 @@ app.add_middleware(
 
 @app.middleware("http")
 async def check_url(request: Request, call_next):
-    start_time = int(time.time())
-    app.state.PIPELINES = get_all_pipelines()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = int(time.time()) - start_time
-    response.headers["X-Process-Time"] = str(process_time)
+    process_time = time.perf_counter() - start_time
+    response.headers["X-Process-Time"] = f"{process_time:.6f}"
+
+    # Label by route template, not the raw path, to keep the series count bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    REQUEST_LATENCY.observe(
+        process_time, method=request.method, route=route, status=response.status_code
+    )
 
     return response
 
@@ -288,7 +532,6 @@ async def get_models(user: str = Depends(get_current_user)):
     """
     Returns the available pipelines
     """
-    app.state.PIPELINES = get_all_pipelines()
     return {
         "data": [
             {
@@ -314,7 +557,7 @@ async def get_models(user: str = Depends(get_current_user)):
                     "valves": pipeline["valves"] != None,
                 },
             }
-            for pipeline in app.state.PIPELINES.values()
+            for pipeline in REGISTRY.pipelines.values()
         ],
         "object": "list",
         "pipelines": True,
@@ -384,6 +627,23 @@ async def download_file(url: str, dest_folder: str):
     return file_path
 
 
+@app.get("/v1/pipelines/startup")
+@app.get("/pipelines/startup")
+async def get_startup_report(user: str = Depends(get_current_user)):
+    if user != API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+        )
+
+    return {
+        "data": [
+            {"module": module_name, **report}
+            for module_name, report in STARTUP_REPORT.items()
+        ]
+    }
+
+
 @app.post("/v1/pipelines/add")
 @app.post("/pipelines/add")
 async def add_pipeline(
@@ -400,7 +660,13 @@ async def add_pipeline(
 
         print(url)
         file_path = await download_file(url, dest_folder=PIPELINES_DIR)
-        await reload()
+        changes = await reload()
+        if changes["failed"]:
+            return {
+                "status": False,
+                "detail": f"Pipeline downloaded to {file_path} but failed to start",
+                "failed": changes["failed"],
+            }
         return {
             "status": True,
             "detail": f"Pipeline added successfully from {file_path}",
@@ -444,7 +710,13 @@ async def upload_pipeline(
             shutil.copyfileobj(file.file, buffer)
 
         # Perform any necessary reload or processing
-        await reload()
+        changes = await reload()
+        if changes["failed"]:
+            return {
+                "status": False,
+                "detail": f"Pipeline uploaded to {file_path} but failed to start",
+                "failed": changes["failed"],
+            }
 
         return {
             "status": True,
@@ -477,10 +749,7 @@ async def delete_pipeline(
     pipeline_id = form_data.id
     pipeline_name = PIPELINE_NAMES.get(pipeline_id.split(".")[0], None)
 
-    if PIPELINE_MODULES[pipeline_id]:
-        if hasattr(PIPELINE_MODULES[pipeline_id], "on_shutdown"):
-            await PIPELINE_MODULES[pipeline_id].on_shutdown()
-
+    # reload() notices the missing file and shuts the pipeline down
     pipeline_path = os.path.join(PIPELINES_DIR, f"{pipeline_name}.py")
     if os.path.exists(pipeline_path):
         os.remove(pipeline_path)
@@ -498,10 +767,16 @@ async def delete_pipeline(
 
 @app.post("/v1/pipelines/reload")
 @app.post("/pipelines/reload")
-async def reload_pipelines(user: str = Depends(get_current_user)):
+async def reload_pipelines(force: bool = False, user: str = Depends(get_current_user)):
     if user == API_KEY:
-        await reload()
-        return {"message": "Pipelines reloaded successfully."}
+        if force:
+            await reload_all()
+            return {"message": "Pipelines reloaded successfully."}
+
+        changes = await reload()
+        if changes["failed"]:
+            return {"message": "Some pipelines failed to start.", **changes}
+        return {"message": "Pipelines reloaded successfully.", **changes}
     else:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -509,6 +784,31 @@ async def reload_pipelines(user: str = Depends(get_current_user)):
         )
 
 
+@app.post("/v1/pipelines/{pipeline_id}/reload")
+@app.post("/pipelines/{pipeline_id}/reload")
+async def reload_single_pipeline(pipeline_id: str, user: str = Depends(get_current_user)):
+    if user != API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+        )
+
+    module_name = PIPELINE_NAMES.get(pipeline_id.split(".")[0], None)
+    if module_name is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Pipeline {pipeline_id} not found",
+        )
+
+    if not await reload_module(module_name):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Pipeline {pipeline_id} failed to start: "
+            f"{startup_errors([module_name])[module_name] or 'its file is gone'}",
+        )
+    return {"message": f"Pipeline {pipeline_id} reloaded successfully."}
+
+
 @app.get("/v1/{pipeline_id}/valves")
 @app.get("/{pipeline_id}/valves")
 async def get_valves(pipeline_id: str):
@@ -582,6 +882,8 @@ async def update_valves(pipeline_id: str, form_data: dict):
 
         if hasattr(pipeline, "on_valves_updated"):
             await pipeline.on_valves_updated()
+
+        REGISTRY.rebuild()
     except Exception as e:
         print(e)
         raise HTTPException(
@@ -595,14 +897,15 @@ async def update_valves(pipeline_id: str, form_data: dict):
 @app.post("/v1/{pipeline_id}/filter/inlet")
 @app.post("/{pipeline_id}/filter/inlet")
 async def filter_inlet(pipeline_id: str, form_data: FilterForm):
-    if pipeline_id not in app.state.PIPELINES:
+    pipelines = REGISTRY.pipelines
+    if pipeline_id not in pipelines:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Filter {pipeline_id} not found",
         )
 
     try:
-        pipeline = app.state.PIPELINES[form_data.body["model"]]
+        pipeline = pipelines[form_data.body["model"]]
         if pipeline["type"] == "manifold":
             pipeline_id = pipeline_id.split(".")[0]
     except:
@@ -610,6 +913,7 @@ async def filter_inlet(pipeline_id: str, form_data: FilterForm):
 
     pipeline = PIPELINE_MODULES[pipeline_id]
 
+    start_time = time.perf_counter()
     try:
         if hasattr(pipeline, "inlet"):
             body = await pipeline.inlet(form_data.body, form_data.user)
@@ -618,23 +922,29 @@ async def filter_inlet(pipeline_id: str, form_data: FilterForm):
             return form_data.body
     except Exception as e:
         print(e)
+        ERRORS.inc(pipeline=pipeline_id, stage="inlet")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"{str(e)}",
         )
+    finally:
+        FILTER_DURATION.observe(
+            time.perf_counter() - start_time, pipeline=pipeline_id, stage="inlet"
+        )
 
 
 @app.post("/v1/{pipeline_id}/filter/outlet")
 @app.post("/{pipeline_id}/filter/outlet")
 async def filter_outlet(pipeline_id: str, form_data: FilterForm):
-    if pipeline_id not in app.state.PIPELINES:
+    pipelines = REGISTRY.pipelines
+    if pipeline_id not in pipelines:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Filter {pipeline_id} not found",
         )
 
     try:
-        pipeline = app.state.PIPELINES[form_data.body["model"]]
+        pipeline = pipelines[form_data.body["model"]]
         if pipeline["type"] == "manifold":
             pipeline_id = pipeline_id.split(".")[0]
     except:
@@ -642,6 +952,7 @@ async def filter_outlet(pipeline_id: str, form_data: FilterForm):
 
     pipeline = PIPELINE_MODULES[pipeline_id]
 
+    start_time = time.perf_counter()
     try:
         if hasattr(pipeline, "outlet"):
             body = await pipeline.outlet(form_data.body, form_data.user)
@@ -650,10 +961,130 @@ async def filter_outlet(pipeline_id: str, form_data: FilterForm):
             return form_data.body
     except Exception as e:
         print(e)
+        ERRORS.inc(pipeline=pipeline_id, stage="outlet")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"{str(e)}",
         )
+    finally:
+        FILTER_DURATION.observe(
+            time.perf_counter() - start_time, pipeline=pipeline_id, stage="outlet"
+        )
+
+
+async def call_pipe(pipe, kwargs, run_sync=run_in_threadpool):
+    """
+    Calls a pipe without blocking the event loop.
+
+    `async def` pipes are awaited directly; legacy sync pipes run through `run_sync`.
+    """
+    if inspect.iscoroutinefunction(pipe):
+        return await pipe(**kwargs)
+
+    # Run in a copy of the request context so the pipe sees current_cancel_token()
+    context = contextvars.copy_context()
+    res = await run_sync(context.run, functools.partial(pipe, **kwargs))
+    if inspect.isawaitable(res):
+        res = await res
+    return res
+
+
+def iterate_pipe_result(res, run_sync=run_in_threadpool):
+    """
+    Returns an async iterator over a pipe result. Async iterators are driven on
+    the event loop; sync iterators are stepped one item at a time through `run_sync`.
+    """
+    if isinstance(res, AsyncIterator):
+        return res
+    return ThreadedIterator(res, run_sync)
+
+
+async def close_pipe_stream(stream):
+    """Stops a pipe stream whose client has gone away."""
+    if isinstance(stream, ThreadedIterator):
+        stream.close()
+    elif isinstance(stream, AsyncGenerator):
+        # The request scope is already cancelled; shield so the generator's cleanup can run
+        with anyio.CancelScope(shield=True):
+            await stream.aclose()
+
+
+def normalize_stream_line(line) -> str:
+    """Turns a streamed item into a str; models and dicts become `data:` lines."""
+    if isinstance(line, BaseModel):
+        line = line.model_dump_json()
+        line = f"data: {line}"
+
+    elif isinstance(line, dict):
+        line = json.dumps(line)
+        line = f"data: {line}"
+
+    elif isinstance(line, bytes):
+        line = line.decode("utf-8")
+        logging.debug(f"stream_content:Generator:{line}")
+
+    return line if isinstance(line, str) else str(line)
+
+
+def record_cancelled_stream(body: dict, chunks: int):
+    STREAM_STATS["cancelled_streams"] += 1
+    STREAM_CANCELLATIONS.inc(pipeline=body.get("model", ""))
+    STREAM_STATS["chunks_before_cancel"] += chunks
+
+    # Only requests with a token cap give a usable estimate of what was not generated
+    max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+    if isinstance(max_tokens, int):
+        STREAM_STATS["estimated_tokens_saved"] += max(0, max_tokens - chunks)
+
+    logging.info(f"Stream cancelled by client after {chunks} chunks")
+
+
+@app.get("/v1/pipelines/limits")
+@app.get("/pipelines/limits")
+async def get_pipeline_limits(user: str = Depends(get_current_user)):
+    if user != API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+        )
+
+    return LIMITERS.stats()
+
+
+@app.get("/v1/pipelines/streams")
+@app.get("/pipelines/streams")
+async def get_stream_stats(user: str = Depends(get_current_user)):
+    if user != API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+        )
+
+    return STREAM_STATS
+
+
+@app.get("/v1/pipelines/models")
+@app.get("/pipelines/models")
+async def get_embedding_models(user: str = Depends(get_current_user)):
+    if user != API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+        )
+
+    # Embedding models shared by the pipelines, with holders and estimated memory
+    return EMBEDDING_MODELS.stats()
+
+
+@app.get("/metrics")
+async def get_metrics(user: str = Depends(get_current_user)):
+    if user != API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+        )
+
+    return Response(METRICS.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/v1/chat/completions")
@@ -661,129 +1092,174 @@ async def filter_outlet(pipeline_id: str, form_data: FilterForm):
 async def generate_openai_chat_completion(form_data: OpenAIChatCompletionForm):
     messages = [message.model_dump() for message in form_data.messages]
     user_message = get_last_user_message(messages)
+    pipelines = REGISTRY.pipelines
 
     if (
-        form_data.model not in app.state.PIPELINES
-        or app.state.PIPELINES[form_data.model]["type"] == "filter"
+        form_data.model not in pipelines
+        or pipelines[form_data.model]["type"] == "filter"
     ):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Pipeline {form_data.model} not found",
         )
 
-    def job():
-        print(form_data.model)
+    pipeline = pipelines[form_data.model]
+    pipeline_id = form_data.model
 
-        pipeline = app.state.PIPELINES[form_data.model]
-        pipeline_id = form_data.model
+    logging.debug(pipeline_id)
 
-        print(pipeline_id)
+    if pipeline["type"] == "manifold":
+        module_id, pipeline_id = pipeline_id.split(".", 1)
+    else:
+        module_id = pipeline_id
+    module = PIPELINE_MODULES[module_id]
+    pipe = module.pipe
 
-        if pipeline["type"] == "manifold":
-            manifold_id, pipeline_id = pipeline_id.split(".", 1)
-            pipe = PIPELINE_MODULES[manifold_id].pipe
-        else:
-            pipe = PIPELINE_MODULES[pipeline_id].pipe
+    # Admission control: fail fast instead of queueing behind a saturated pipeline
+    limiter = LIMITERS.get(module_id, module)
+    try:
+        slot = await limiter.acquire()
+    except PipelineOverloaded as e:
+        ERRORS.inc(pipeline=form_data.model, stage="admission")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(PIPELINES_RETRY_AFTER)},
+        )
+
+    pipe_kwargs = {
+        "user_message": user_message,
+        "model_id": pipeline_id,
+        "messages": messages,
+        "body": form_data.model_dump(),
+    }
 
-        if form_data.stream:
+    if form_data.stream:
 
-            def stream_content():
-                res = pipe(
-                    user_message=user_message,
-                    model_id=pipeline_id,
-                    messages=messages,
-                    body=form_data.model_dump(),
-                )
+        async def stream_content():
+            encoder = StreamEncoder(
+                form_data.model,
+                flush_interval=PIPELINES_STREAM_FLUSH_INTERVAL,
+                flush_bytes=PIPELINES_STREAM_FLUSH_BYTES,
+            )
+            token = CancelToken()
+            set_cancel_token(token)
+            stream = None
+            chunks = 0
+            start_time = time.perf_counter()
+            first_chunk_time = None
+
+            try:
+                res = await call_pipe(pipe, pipe_kwargs, limiter.run_sync)
                 logging.info(f"stream:true:{res}")
 
                 if isinstance(res, str):
-                    message = stream_message_template(form_data.model, res)
-                    logging.info(f"stream_content:str:{message}")
-                    yield f"data: {json.dumps(message)}\n\n"
-
-                if isinstance(res, Iterator):
-                    for line in res:
-                        if isinstance(line, BaseModel):
-                            line = line.model_dump_json()
-                            line = f"data: {line}"
-
-                        elif isinstance(line, dict):
-                            line = json.dumps(line)
-                            line = f"data: {line}"
-
-                        try:
-                            line = line.decode("utf-8")
-                            logging.info(f"stream_content:Generator:{line}")
-                        except:
-                            pass
-
-                        if isinstance(line, str) and line.startswith("data:"):
+                    logging.debug(f"stream_content:str:{res}")
+                    TIME_TO_FIRST_TOKEN.observe(
+                        time.perf_counter() - start_time, pipeline=form_data.model
+                    )
+                    yield encoder.encode(res)
+
+                if isinstance(res, (Iterator, AsyncIterator)):
+                    stream = iterate_pipe_result(res, limiter.run_sync)
+                    async for line in stream:
+                        line = normalize_stream_line(line)
+                        chunks += 1
+                        if first_chunk_time is None:
+                            first_chunk_time = time.perf_counter()
+                            TIME_TO_FIRST_TOKEN.observe(
+                                first_chunk_time - start_time, pipeline=form_data.model
+                            )
+
+                        if line.startswith("data:"):
+                            # Pre-formatted SSE line from the pipe: pass it through as is
+                            frame = encoder.flush()
+                            if frame:
+                                yield frame
                             yield f"{line}\n\n"
                         else:
-                            line = stream_message_template(form_data.model, line)
-                            yield f"data: {json.dumps(line)}\n\n"
-
-                if isinstance(res, str) or isinstance(res, Generator):
-                    finish_message = {
-                        "id": f"{form_data.model}-{str(uuid.uuid4())}",
-                        "object": "chat.completion.chunk",
-                        "created": int(time.time()),
-                        "model": form_data.model,
-                        "choices": [
-                            {
-                                "index": 0,
-                                "delta": {},
-                                "logprobs": None,
-                                "finish_reason": "stop",
-                            }
-                        ],
-                    }
+                            frame = encoder.push(line)
+                            if frame:
+                                yield frame
+
+                    frame = encoder.flush()
+                    if frame:
+                        yield frame
+
+                    elapsed = time.perf_counter() - (first_chunk_time or start_time)
+                    if chunks > 1 and elapsed > 0:
+                        TOKENS_PER_SECOND.observe(
+                            (chunks - 1) / elapsed, pipeline=form_data.model
+                        )
+
+                if isinstance(res, (str, Generator, AsyncGenerator)):
+                    yield encoder.finish()
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client disconnected: stop the pipe instead of generating into the void
+                token.cancel()
+                await close_pipe_stream(stream)
+                record_cancelled_stream(pipe_kwargs["body"], chunks)
+                raise
+            except Exception:
+                ERRORS.inc(pipeline=form_data.model, stage="pipe")
+                raise
+            finally:
+                PIPE_DURATION.observe(
+                    time.perf_counter() - start_time, pipeline=form_data.model
+                )
+                slot.release()
 
-                    yield f"data: {json.dumps(finish_message)}\n\n"
-                    yield f"data: [DONE]"
+        content = stream_content()
+        # Also free the slot if the response is dropped before streaming starts
+        weakref.finalize(content, slot.release)
+        return StreamingResponse(content, media_type="text/event-stream")
+    else:
+        start_time = time.perf_counter()
+        try:
+            return await generate_completion(form_data, pipe, pipe_kwargs, limiter)
+        except Exception:
+            ERRORS.inc(pipeline=form_data.model, stage="pipe")
+            raise
+        finally:
+            PIPE_DURATION.observe(time.perf_counter() - start_time, pipeline=form_data.model)
+            slot.release()
+
+
+async def generate_completion(form_data, pipe, pipe_kwargs, limiter):
+    """Runs a non-streaming completion and returns the OpenAI-style response."""
+    res = await call_pipe(pipe, pipe_kwargs, limiter.run_sync)
+    logging.info(f"stream:false:{res}")
+
+    if isinstance(res, dict):
+        return res
+    elif isinstance(res, BaseModel):
+        return res.model_dump()
+    else:
 
-            return StreamingResponse(stream_content(), media_type="text/event-stream")
-        else:
-            res = pipe(
-                user_message=user_message,
-                model_id=pipeline_id,
-                messages=messages,
-                body=form_data.model_dump(),
-            )
-            logging.info(f"stream:false:{res}")
+        message = ""
 
-            if isinstance(res, dict):
-                return res
-            elif isinstance(res, BaseModel):
-                return res.model_dump()
-            else:
+        if isinstance(res, str):
+            message = res
 
-                message = ""
+        if isinstance(res, (Generator, AsyncGenerator)):
+            async for stream in iterate_pipe_result(res, limiter.run_sync):
+                message = f"{message}{stream}"
 
-                if isinstance(res, str):
-                    message = res
-
-                if isinstance(res, Generator):
-                    for stream in res:
-                        message = f"{message}{stream}"
-
-                logging.info(f"stream:false:{message}")
-                return {
-                    "id": f"{form_data.model}-{str(uuid.uuid4())}",
-                    "object": "chat.completion",
-                    "created": int(time.time()),
-                    "model": form_data.model,
-                    "choices": [
-                        {
-                            "index": 0,
-                            "message": {
-                                "role": "assistant",
-                                "content": message,
-                            },
-                            "logprobs": None,
-                            "finish_reason": "stop",
-                        }
-                    ],
+        logging.info(f"stream:false:{message}")
+        return {
+            "id": f"{form_data.model}-{str(uuid.uuid4())}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": form_data.model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {
+                        "role": "assistant",
+                        "content": message,
+                    },
+                    "logprobs": None,
+                    "finish_reason": "stop",
                 }
-
-    return await run_in_threadpool(job)
+            ],
+        }
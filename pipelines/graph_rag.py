@@ -1,10 +1,13 @@
-from typing import List, Optional, Union, Generator, Iterator, Tuple
+from typing import List, Optional, Union, Generator, Iterator, Tuple, AsyncGenerator
 import os
+import asyncio
 from pydantic import BaseModel
-from utils.graphrag.helper import generic_result_formatter, parse_user_info
-from utils.graphrag.constants import QUERY_TEMPLATE, PROMPT_TEMPLATE, USER_INFO_DICTIONARY, DEFAULT_PROMPT
+from utils.graphrag.helper import BatchResultFormatter, parse_user_info
+from utils.graphrag.constants import QUERY_TEMPLATE, MATERIALIZED_QUERY_TEMPLATE, PROMPT_TEMPLATE, USER_INFO_DICTIONARY, DEFAULT_PROMPT
 from neo4j_graphrag.types import LLMMessage
 
+NEO4J_URI = 'neo4j+s://e0a0bc0d.databases.neo4j.io'
+
 class Pipeline:
     class Valves(BaseModel):
         OPENAI_API_KEY: str
@@ -12,11 +15,36 @@ class Pipeline:
         NEO4J_USERNAME: str
         NEO4J_PASSWORD: str
         user_id: int
+        EMBEDDING_CACHE_SIZE: int
+        EMBEDDING_CACHE_TTL: int
+        EMBEDDING_CACHE_PATH: str
+        SUMMARY_MIN_TURNS: int
+        SUMMARY_MIN_TOKENS: int
+        CONCURRENT_SEARCH: bool
+        REQUERY_THRESHOLD: float
+        RETRIEVAL_CACHE_PATH: str
+        RETRIEVAL_CACHE_SIZE: int
+        RETRIEVAL_CACHE_TTL: int
+        CONTEXT_MAX_TOKENS: int
+        CONTEXT_PROPERTIES: str
+        MATERIALIZED_NEIGHBORHOOD: bool
+        LOCAL_ANN_PATH: str
+        ANSWER_CACHE_THRESHOLD: float
+        ANSWER_CACHE_SIZE: int
+        ANSWER_CACHE_TTL: int
+        EMBEDDING_BACKEND: str
+        EMBEDDING_ONNX_DIR: str
+        EMBEDDING_ONNX_QUANTIZATION: str
 
     def __init__(self):
         self.name='Graph RAG'
         self.driver = None
+        self.async_driver = None
         self.embedder = None
+        self.retrieval_cache = None
+        self.graph_version = None
+        self.embedding_version = None
+        self.local_index = None
         # self.retriever = None
         # self.llm = None
         self.rag = None
@@ -28,44 +56,125 @@ class Pipeline:
                 'NEO4J_USERNAME': os.getenv('NEO4J_USERNAME', ''),
                 'NEO4J_PASSWORD': os.getenv('NEO4J_PASSWORD', ''),
                 'user_id': 1, # Default user_id
+                'EMBEDDING_CACHE_SIZE': int(os.getenv('EMBEDDING_CACHE_SIZE', 1024)),
+                'EMBEDDING_CACHE_TTL': int(os.getenv('EMBEDDING_CACHE_TTL', 3600)),
+                'EMBEDDING_CACHE_PATH': os.getenv('EMBEDDING_CACHE_PATH', ''), # SQLite file, empty for memory only
+                # Shorter histories are passed to retrieval verbatim instead of summarized
+                'SUMMARY_MIN_TURNS': int(os.getenv('SUMMARY_MIN_TURNS', 6)),
+                'SUMMARY_MIN_TOKENS': int(os.getenv('SUMMARY_MIN_TOKENS', 1500)),
+                # Retrieve on the raw query while the history is condensed
+                'CONCURRENT_SEARCH': os.getenv('GRAPHRAG_CONCURRENT_SEARCH', 'false').lower() == 'true',
+                'REQUERY_THRESHOLD': float(os.getenv('GRAPHRAG_REQUERY_THRESHOLD', 0.9)),
+                # SQLite file shared with the backend, empty to keep the cache in memory
+                'RETRIEVAL_CACHE_PATH': os.getenv('RETRIEVAL_CACHE_PATH', ''),
+                'RETRIEVAL_CACHE_SIZE': int(os.getenv('RETRIEVAL_CACHE_SIZE', 1000)),
+                'RETRIEVAL_CACHE_TTL': int(os.getenv('RETRIEVAL_CACHE_TTL', 3600)),
+                # Token budget for the retrieved context in the prompt
+                'CONTEXT_MAX_TOKENS': int(os.getenv('CONTEXT_MAX_TOKENS', 4000)),
+                # Comma-separated node properties to render, empty for all of them
+                'CONTEXT_PROPERTIES': os.getenv('CONTEXT_PROPERTIES', ''),
+                # Read 2-hop neighbourhoods written by `python -m utils.graphrag.materialize refresh`
+                'MATERIALIZED_NEIGHBORHOOD': os.getenv('GRAPHRAG_MATERIALIZED_NEIGHBORHOOD', 'false').lower() == 'true',
+                # Snapshot written by `python -m utils.graphrag.ann export`, empty to search the Neo4j index
+                'LOCAL_ANN_PATH': os.getenv('LOCAL_ANN_PATH', ''),
+                # Reuse answers to similar first questions with the same user context; size 0 disables
+                'ANSWER_CACHE_THRESHOLD': float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.95)),
+                'ANSWER_CACHE_SIZE': int(os.getenv('ANSWER_CACHE_SIZE', 1000)),
+                'ANSWER_CACHE_TTL': int(os.getenv('ANSWER_CACHE_TTL', 3600)),
+                # "torch", or "onnx-int8" for the model exported by `python -m utils.pipelines.embeddings export`
+                'EMBEDDING_BACKEND': os.getenv('EMBEDDING_BACKEND', 'torch'),
+                'EMBEDDING_ONNX_DIR': os.getenv('EMBEDDING_ONNX_DIR', './models/onnx'),
+                'EMBEDDING_ONNX_QUANTIZATION': os.getenv('EMBEDDING_ONNX_QUANTIZATION', 'avx512_vnni'),
             }
         )
 
     async def on_startup(self):
+        # Loading the embedder blocks; keep it off the server's event loop
+        await asyncio.to_thread(self._build)
+        # The async driver is used from this loop, so it is created here
+        self._build_async_retriever()
+
+    def _build(self):
         # Set up the graph-based RAG pipeline here (using Neo4j)
-        from neo4j_graphrag.retrievers import VectorCypherRetriever
+        from utils.graphrag.retrievers import BatchVectorCypherRetriever
         from neo4j import GraphDatabase
         from neo4j_graphrag.llm import OpenAILLM
         from utils.graphrag.schemas import GraphRAG, RagTemplate
-        from neo4j_graphrag.embeddings.sentence_transformers import SentenceTransformerEmbeddings
+        from utils.graphrag.embeddings import CachedEmbedder, SharedSentenceTransformerEmbeddings
+        from utils.pipelines.embeddings import TORCH, model_spec
+        from utils.graphrag.summary import ConversationSummaryStore
+        from utils.graphrag.context import ContextPacker
+        from utils.graphrag.retrieval_cache import CachedRetriever, GraphVersion, RetrievalCache, EMBEDDING_VERSION_QUERY
+        from utils.graphrag.ann import LocalIndexRetriever, load_local_index
+        from utils.graphrag.answer_cache import SemanticAnswerCache
         os.environ["OPENAI_API_KEY"] = self.valves.OPENAI_API_KEY
 
 
         # Connect to Neo4j database
         driver=GraphDatabase.driver(
-            uri='neo4j+s://e0a0bc0d.databases.neo4j.io',
+            uri=NEO4J_URI,
             auth=(os.getenv('NEO4J_USERNAME'), os.getenv('NEO4J_PASSWORD'))
             )
         
         # Initialise embedder
         try:
-            embedder=SentenceTransformerEmbeddings(model='intfloat/e5-base-v2')
+            model, model_kwargs=model_spec(
+                'intfloat/e5-base-v2',
+                backend=self.valves.EMBEDDING_BACKEND,
+                onnx_dir=self.valves.EMBEDDING_ONNX_DIR,
+                quantization=self.valves.EMBEDDING_ONNX_QUANTIZATION,
+                )
+            embedder=CachedEmbedder(
+                SharedSentenceTransformerEmbeddings(model=model, **model_kwargs),
+                # Quantized embeddings drift slightly, so they are cached apart from the PyTorch ones
+                model_name='intfloat/e5-base-v2' if self.valves.EMBEDDING_BACKEND == TORCH else f'intfloat/e5-base-v2@{self.valves.EMBEDDING_BACKEND}',
+                max_size=self.valves.EMBEDDING_CACHE_SIZE,
+                ttl=self.valves.EMBEDDING_CACHE_TTL,
+                disk_path=self.valves.EMBEDDING_CACHE_PATH or None,
+                )
         except Exception as e:
             print("Error initializing embedder:", e)
             raise e
         
         # Initalise the retriever
         try:
-            retriever=VectorCypherRetriever(
+            retriever=BatchVectorCypherRetriever(
                 driver=driver,
                 embedder=embedder,
-                retrieval_query=QUERY_TEMPLATE,
-                result_formatter=generic_result_formatter,
+                retrieval_query=self._retrieval_query(),
+                batch_formatter=self._batch_formatter(),
                 index_name='chunk_vec',
                 )
         except Exception as e:
             print("Error initializing retriever:", e)
             raise e
+
+        graph_version=GraphVersion(driver)
+        embedding_version=GraphVersion(driver, query=EMBEDDING_VERSION_QUERY)
+
+        # Find seeds in-process when a snapshot of chunk_vec is available
+        local_index=load_local_index(self.valves.LOCAL_ANN_PATH)
+        if local_index is not None:
+            retriever=LocalIndexRetriever(
+                index=local_index,
+                driver=driver,
+                embedder=embedder,
+                retrieval_query=self._retrieval_query(),
+                fallback=retriever,
+                embedding_version=embedding_version,
+                batch_formatter=self._batch_formatter(),
+                )
+
+        # Cache retrieval results until the graph version is bumped by ingestion
+        retrieval_cache=RetrievalCache(
+            graph_version=graph_version,
+            index_name='chunk_vec',
+            retrieval_query=self._retrieval_query(),
+            path=self.valves.RETRIEVAL_CACHE_PATH or None,
+            max_size=self.valves.RETRIEVAL_CACHE_SIZE,
+            ttl=self.valves.RETRIEVAL_CACHE_TTL,
+            )
+        retriever=CachedRetriever(retriever, retrieval_cache)
         
         # Initialise LLM instance
         llm=OpenAILLM(
@@ -81,10 +190,28 @@ class Pipeline:
         rag=GraphRAG(
             retriever=retriever,
             llm=llm,
-            prompt_template=prompt_template
+            prompt_template=prompt_template,
+            summary_store=ConversationSummaryStore(
+                min_turns=self.valves.SUMMARY_MIN_TURNS,
+                min_tokens=self.valves.SUMMARY_MIN_TOKENS,
+            ),
+            concurrent=self.valves.CONCURRENT_SEARCH,
+            requery_threshold=self.valves.REQUERY_THRESHOLD,
+            context_packer=ContextPacker(max_tokens=self.valves.CONTEXT_MAX_TOKENS),
+            answer_cache=SemanticAnswerCache(
+                threshold=self.valves.ANSWER_CACHE_THRESHOLD,
+                max_size=self.valves.ANSWER_CACHE_SIZE,
+                ttl=self.valves.ANSWER_CACHE_TTL,
+            ) if self.valves.ANSWER_CACHE_SIZE > 0 else None,
+            # As many searches as the server admits to this pipeline at once
+            max_concurrent_searches=int(os.getenv('PIPELINES_MAX_CONCURRENCY', 8)),
         )
         self.driver=driver
         self.embedder=embedder
+        self.retrieval_cache=retrieval_cache
+        self.graph_version=graph_version
+        self.embedding_version=embedding_version
+        self.local_index=local_index
         self.rag=rag
 
         pass
@@ -93,15 +220,59 @@ class Pipeline:
         # Function to close the Neo4j driver connection
         if self.driver:
             self.driver.close()
+        if self.async_driver:
+            await self.async_driver.close()
+        if self.embedder:
+            self.embedder.close()
+        if self.retrieval_cache:
+            self.retrieval_cache.close()
+        if self.rag:
+            self.rag.close()
         pass
 
-    def pipe(
+    def _retrieval_query(self):
+        return MATERIALIZED_QUERY_TEMPLATE if self.valves.MATERIALIZED_NEIGHBORHOOD else QUERY_TEMPLATE
+
+    def _batch_formatter(self):
+        properties=[p.strip() for p in self.valves.CONTEXT_PROPERTIES.split(',') if p.strip()]
+        return BatchResultFormatter(properties=properties or None)
+
+    def _build_async_retriever(self):
+        from neo4j import AsyncGraphDatabase
+        from utils.graphrag.retrievers import AsyncVectorCypherRetriever
+        from utils.graphrag.retrieval_cache import AsyncCachedRetriever
+        from utils.graphrag.ann import AsyncLocalIndexRetriever
+
+        self.async_driver=AsyncGraphDatabase.driver(
+            uri=NEO4J_URI,
+            auth=(os.getenv('NEO4J_USERNAME'), os.getenv('NEO4J_PASSWORD'))
+            )
+        retriever=AsyncVectorCypherRetriever(
+            driver=self.async_driver,
+            index_name='chunk_vec',
+            embedder=self.embedder,
+            retrieval_query=self._retrieval_query(),
+            batch_formatter=self._batch_formatter(),
+            )
+        if self.local_index is not None:
+            retriever=AsyncLocalIndexRetriever(
+                index=self.local_index,
+                driver=self.async_driver,
+                embedder=self.embedder,
+                retrieval_query=self._retrieval_query(),
+                fallback=retriever,
+                embedding_version=self.embedding_version,
+                batch_formatter=self._batch_formatter(),
+                )
+        self.rag.async_retriever=AsyncCachedRetriever(retriever, self.retrieval_cache)
+
+    async def pipe(
         self, 
         model_id: str,
         user_message: str,
         messages: List[dict] = [], #TODO: Change to List[],
         body: dict = {} 
-    ) -> Union[str, Generator, Iterator]:
+    ) -> AsyncGenerator[str, None]:
         # Define the RAG pipeline here
         from backend.models.data import PERSONNELS_DATA
         from backend.models.personal import Personnel
@@ -116,15 +287,15 @@ class Pipeline:
         if messages:
             messages=[LLMMessage(**msg) for msg in messages]
 
-        # Perform the RAG search
-        rag_result = self.rag.search(
+        # Perform the RAG search; the server streams the tokens as they are generated
+        return self.rag.asearch(
             message_history=messages,
             query_text=user_message,
             user_info=user_info,
+            conversation_id=body.get('chat_id'),
             retriever_config={
                 "query_params": { # Cypher query parameters
                     "limit": 100,
                     },
         },
-        )
-        return rag_result.answer
\ No newline at end of file
+        )
\ No newline at end of file
@@ -1,28 +1,56 @@
 from typing import List, Union, Generator, Iterator
 from schemas import OpenAIChatMessage
 import os
+import asyncio
+import logging
+import time
 from pydantic import BaseModel
+from utils.pipelines.cancel import current_cancel_token
+from utils.pipelines.metrics import METRICS
+
+TIME_TO_FIRST_TOKEN = METRICS.histogram(
+    "hybrid_rag_time_to_first_token_seconds",
+    "Time from the start of the Hybrid RAG pipe to its first answer token.",
+)
 
 
 class Pipeline:
     class Valves(BaseModel):
         OPENAI_API_KEY: str
         DOCUMENT_RAG_MODEL: str
+        RETRIEVER_TIMEOUT: float
+        EMBEDDING_BACKEND: str
+        EMBEDDING_ONNX_DIR: str
+        EMBEDDING_ONNX_QUANTIZATION: str
         
     def __init__(self):
         self.name = "Hybrid RAG"
         self.basic_rag_pipeline = None
+        self.text_embedder = None
+        self.retriever = None
+        self.generator = None
         self.valves=self.Valves(
             **{
                 "pipelines": ["*"],
                 "OPENAI_API_KEY":os.getenv('OPENAI_API_KEY',''),
                 "DOCUMENT_RAG_MODEL": os.getenv("DOCUMENT_RAG_MODEL", "gpt-4o"),
+                # Seconds each document store may take before its documents are left out
+                "RETRIEVER_TIMEOUT": float(os.getenv("HYBRID_RETRIEVER_TIMEOUT", 5)),
+                # "torch", or "onnx-int8" for the model exported by `python -m utils.pipelines.embeddings export`
+                "EMBEDDING_BACKEND": os.getenv("EMBEDDING_BACKEND", "torch"),
+                "EMBEDDING_ONNX_DIR": os.getenv("EMBEDDING_ONNX_DIR", "./models/onnx"),
+                "EMBEDDING_ONNX_QUANTIZATION": os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx512_vnni"),
             }
         )
 
     async def on_startup(self):
-        from utils.pipelines.components import ThresholdFilter
-        from haystack.components.embedders import SentenceTransformersDocumentEmbedder, SentenceTransformersTextEmbedder
+        # Loading the embedder blocks; keep it off the server's event loop
+        await asyncio.to_thread(self._build)
+
+    def _build(self):
+        from utils.pipelines.components import ParallelRetriever, SharedSentenceTransformersTextEmbedder, ThresholdFilter
+        from utils.pipelines.embeddings import model_spec
+        from haystack.components.embedders import SentenceTransformersDocumentEmbedder
         from haystack.components.rankers import SentenceTransformersSimilarityRanker
         from haystack_integrations.document_stores.chroma import ChromaDocumentStore
         from haystack_integrations.components.retrievers.chroma import ChromaEmbeddingRetriever
@@ -31,10 +59,18 @@ class Pipeline:
         from haystack import Pipeline
         os.environ["OPENAI_API_KEY"] = self.valves.OPENAI_API_KEY
 
-        # Embedder to convert query text to embeddings
-        text_embedder = SentenceTransformersTextEmbedder(
-            model="intfloat/e5-large-v2"
+        # Embedder to convert query text to embeddings; the weights are shared across pipelines and reloads
+        model, model_kwargs = model_spec(
+            "intfloat/e5-large-v2",
+            backend=self.valves.EMBEDDING_BACKEND,
+            onnx_dir=self.valves.EMBEDDING_ONNX_DIR,
+            quantization=self.valves.EMBEDDING_ONNX_QUANTIZATION,
+        )
+        text_embedder = SharedSentenceTransformersTextEmbedder(
+            model=model, **model_kwargs
         )
+        text_embedder.warm_up()
+        self.text_embedder = text_embedder
 
         # Literature Document Store and Retriever
         lit_document_store=ChromaDocumentStore(persist_path="./chroma_db/literature")
@@ -44,6 +80,15 @@ class Pipeline:
         int_document_store=ChromaDocumentStore(persist_path="./chroma_db/internal")
         int_retriever = ChromaEmbeddingRetriever(int_document_store, top_k=5)
 
+        # Query both stores at the same time
+        retriever = ParallelRetriever(
+            {"internal": int_retriever, "literature": lit_retriever},
+            timeout=self.valves.RETRIEVER_TIMEOUT,
+            # As many runs as the server admits to this pipeline at once
+            max_concurrent_runs=int(os.getenv("PIPELINES_MAX_CONCURRENCY", 8)),
+        )
+        self.retriever = retriever
+
         # Threshold Filter
         threshold_filter = ThresholdFilter(threshold=0)
 
@@ -83,54 +128,92 @@ class Pipeline:
         ### Pipeline definition and components ###
         self.basic_rag_pipeline = Pipeline()
         self.basic_rag_pipeline.add_component("text_embedder", text_embedder)
-        self.basic_rag_pipeline.add_component("int_retriever", int_retriever)
-        self.basic_rag_pipeline.add_component("lit_retriever", lit_retriever)
+        self.basic_rag_pipeline.add_component("retriever", retriever)
         self.basic_rag_pipeline.add_component('threshold_filter', threshold_filter)
         # self.basic_rag_pipeline.add_component('reranker', reranker)
         self.basic_rag_pipeline.add_component("prompt_builder", prompt_builder)
-        self.basic_rag_pipeline.add_component("llm", generator)
+        # The LLM runs outside the pipeline so its tokens can be streamed by pipe
+        self.generator = generator
 
         ### Pipeline connections ###
         # Embedding to retrievers
         self.basic_rag_pipeline.connect(
-            "text_embedder.embedding", "int_retriever.query_embedding"
-        )
-        self.basic_rag_pipeline.connect(
-            "text_embedder.embedding", "lit_retriever.query_embedding"
+            "text_embedder.embedding", "retriever.query_embedding"
         )
 
         # Internal Document Retriever to Threshold Filter
-        self.basic_rag_pipeline.connect("int_retriever", "threshold_filter.documents")
+        self.basic_rag_pipeline.connect("retriever.internal", "threshold_filter.documents")
 
         # Prompt Builder
         self.basic_rag_pipeline.connect("threshold_filter.documents", "prompt_builder.internal_documents")
-        self.basic_rag_pipeline.connect("lit_retriever", "prompt_builder.literature_documents")
+        self.basic_rag_pipeline.connect("retriever.literature", "prompt_builder.literature_documents")
 
         # Retrievers to reranker
-        # self.basic_rag_pipeline.connect("lit_retriever", "reranker.documents") 
+        # self.basic_rag_pipeline.connect("retriever.literature", "reranker.documents") 
 
         #TODO: Change this logic to apply reranking logic if need be
         # Reranker to prompt builder
         # self.basic_rag_pipeline.connect("reranker", "prompt_builder.documents")
 
-        # Prompt builder to LLM
-        self.basic_rag_pipeline.connect("prompt_builder", "llm")
-
         pass
 
     async def on_shutdown(self):
         # This function is called when the server is stopped.
+        if self.text_embedder:
+            self.text_embedder.release()
+        if self.retriever:
+            self.retriever.close()
         pass
 
     def pipe(
         self, user_message: str, model_id: str, messages: List[dict], body: dict
     ) -> Union[str, Generator, Iterator]:
 
+        start_time = time.perf_counter()
         question = user_message
+        # Retrieval and prompt building finish before any token is streamed
         response = self.basic_rag_pipeline.run(
             {
                 "text_embedder": {"text": question},
                 "prompt_builder": {"question": question},
             }
         )
-        return response["llm"]["replies"][0]
+        prompt = response["prompt_builder"]["prompt"]
+
+        if body.get("stream"):
+            return self._stream_answer(prompt, start_time)
+        return self.generator.run(prompt=prompt)["replies"][0]
+
+    def _stream_answer(self, prompt: str, start_time: float) -> Generator[str, None, None]:
+        # Iterated by the server one token at a time on this pipeline's threads, so no
+        # extra thread or buffer is needed. OpenAIGenerator only streams through a
+        # callback, so the completion is requested with its client and settings.
+        completion = self.generator.client.chat.completions.create(
+            model=self.generator.model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            **self.generator.generation_kwargs,
+        )
+        # Stop generating when the client disconnects, not only when the stream is closed
+        cancel_token = current_cancel_token()
+        cancel_token.on_cancel(completion.close)
+
+        first_token = True
+        try:
+            for chunk in completion:
+                if cancel_token.cancelled:
+                    return
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if first_token:
+                    first_token = False
+                    elapsed = time.perf_counter() - start_time
+                    TIME_TO_FIRST_TOKEN.observe(elapsed)
+                    logging.info(f"Hybrid RAG time to first token: {elapsed:.3f}s")
+                yield chunk.choices[0].delta.content
+        except Exception:
+            # Closing the response on cancel interrupts the read in progress
+            if not cancel_token.cancelled:
+                raise
+        finally:
+            completion.close()
@@ -80,30 +80,6 @@ download_pipelines() {
   fi
 }
 
-# Function to parse and install requirements from frontmatter
-install_frontmatter_requirements() {
-  local file=$1
-  local file_content=$(cat "$1")
-  # Extract the first triple-quoted block
-  local first_block=$(echo "$file_content" | awk '/"""/{flag=!flag; if(flag) count++; if(count == 2) {exit}} flag' )
-
-  # Check if the block contains requirements
-  local requirements=$(echo "$first_block" | grep -i 'requirements:')
-
-  if [ -n "$requirements" ]; then
-    # Extract the requirements list
-    requirements=$(echo "$requirements" | awk -F': ' '{print $2}' | tr ',' ' ' | tr -d '\r')
-
-    # Construct and echo the pip install command
-    local pip_command="pip install $requirements"
-    echo "$pip_command"
-    pip install $requirements
-  else
-    echo "No requirements found in frontmatter of $file."
-  fi
-}
-
-
 # Parse command line arguments for mode
 MODE="run"   # select a runmode ("setup", "run", "full" (setup + run))
 while [[ "$#" -gt 0 ]]; do
@@ -140,11 +116,9 @@ if [[ "$MODE" == "setup" || "$MODE" == "full" ]]; then
       download_pipelines "$path" "$PIPELINES_DIR"
     done
 
-    for file in "$PIPELINES_DIR"/*; do
-      if [[ -f "$file" ]]; then
-        install_frontmatter_requirements "$file"
-      fi
-    done
+    # Installs frontmatter requirements in one batch, skipping pipelines whose
+    # requirements.lock is already up to date
+    python -m utils.pipelines.requirements "$PIPELINES_DIR"
   else
     echo "PIPELINES_URLS not specified. Skipping pipelines download and installation."
   fi
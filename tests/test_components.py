@@ -0,0 +1,115 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.pipelines.components import ParallelRetriever, SharedSentenceTransformersTextEmbedder
+
+
+class SlowRetriever:
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+
+    def run(self, query_embedding, filters=None, top_k=None):
+        time.sleep(self.delay)
+        return {"documents": [self.name]}
+
+
+class FailingRetriever:
+    def run(self, query_embedding, filters=None, top_k=None):
+        raise RuntimeError("store down")
+
+
+def test_parallel_retriever_serves_concurrent_runs_within_timeout():
+    concurrency = 8
+    retriever = ParallelRetriever(
+        {"internal": SlowRetriever("a", 0.2), "literature": SlowRetriever("b", 0.2)},
+        timeout=0.6,
+        max_concurrent_runs=concurrency,
+    )
+    with ThreadPoolExecutor(max_workers=concurrency) as callers:
+        results = list(callers.map(lambda _: retriever.run(query_embedding=[0.1]), range(concurrency)))
+    retriever.close()
+
+    assert results == [{"internal": ["a"], "literature": ["b"]}] * concurrency
+
+
+def test_parallel_retriever_drops_slow_and_failing_branches():
+    retriever = ParallelRetriever(
+        {"fast": SlowRetriever("a", 0), "slow": SlowRetriever("b", 1), "broken": FailingRetriever()},
+        timeout=0.2,
+    )
+    start_time = time.perf_counter()
+    results = retriever.run(query_embedding=[0.1])
+    retriever.close()
+
+    assert results == {"fast": ["a"], "slow": [], "broken": []}
+    assert time.perf_counter() - start_time < 0.5
+
+
+class FakeBatcher:
+    def __init__(self):
+        self.started = threading.Event()
+        self.proceed = threading.Event()
+        self.proceed.set()
+
+    def encode(self, text, normalize_embeddings=False):
+        self.started.set()
+        self.proceed.wait(5)
+        return [float(len(text))]
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.refs = 0
+        self.acquired = 0
+        self.shared_batcher = FakeBatcher()
+
+    def acquire(self, name, **kwargs):
+        self.refs += 1
+        self.acquired += 1
+        return object()
+
+    def batcher(self, name, **kwargs):
+        return self.shared_batcher
+
+    def release(self, name, **kwargs):
+        self.refs -= 1
+
+
+def test_text_embedder_needs_warm_up():
+    embedder = SharedSentenceTransformersTextEmbedder(model="m", registry=FakeRegistry())
+
+    with pytest.raises(RuntimeError):
+        embedder.run("query")
+
+
+def test_text_embedder_release_during_run():
+    registry = FakeRegistry()
+    embedder = SharedSentenceTransformersTextEmbedder(model="m", prefix="query: ", registry=registry)
+    embedder.warm_up()
+    embedder.warm_up()
+    assert registry.refs == 1
+
+    registry.shared_batcher.proceed.clear()
+    result = {}
+    request = threading.Thread(target=lambda: result.update(embedder.run("hello")))
+    request.start()
+    assert registry.shared_batcher.started.wait(5)
+
+    embedder.release()
+    embedder.release()
+    registry.shared_batcher.proceed.set()
+    request.join(5)
+
+    # The in-flight request finishes on the batcher it started with
+    assert result == {"embedding": [float(len("query: hello"))]}
+    assert registry.refs == 0
+
+    # Pipeline.run warms components up again; a released embedder must not re-acquire
+    embedder.warm_up()
+    assert embedder.run("again") == {"embedding": [float(len("query: again"))]}
+    assert registry.acquired == 1
+    assert registry.refs == 0
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+from utils.pipelines.executors import PipelineLimiters
+
+
+class Valves:
+    def __init__(self, max_concurrency):
+        self.MAX_CONCURRENCY = max_concurrency
+        self.MAX_QUEUE = 4
+
+
+class FakePipeline:
+    def __init__(self, max_concurrency):
+        self.valves = Valves(max_concurrency)
+
+
+def is_shut_down(limiter) -> bool:
+    try:
+        limiter.executor.submit(lambda: None).result()
+    except RuntimeError:
+        return True
+    return False
+
+
+def test_replaced_limiter_shuts_down_after_in_flight_work():
+    async def scenario():
+        limiters = PipelineLimiters(default_concurrency=2, default_queue=4)
+        pipeline = FakePipeline(max_concurrency=2)
+        old = limiters.get("p", pipeline)
+        slot = await old.acquire()
+
+        pipeline.valves.MAX_CONCURRENCY = 3
+        new = limiters.get("p", pipeline)
+        assert new is not old
+
+        # The admitted request still runs on the old limiter's threads
+        assert await old.run_sync(threading.current_thread) is not threading.current_thread()
+        assert not is_shut_down(old)
+
+        slot.release()
+        assert is_shut_down(old)
+        assert not is_shut_down(new)
+
+    asyncio.run(scenario())
+
+
+def test_discard_shuts_down_idle_limiter():
+    async def scenario():
+        limiters = PipelineLimiters(default_concurrency=2, default_queue=4)
+        limiter = limiters.get("p", FakePipeline(max_concurrency=2))
+        await limiter.run_sync(lambda: None)
+
+        limiters.discard("p")
+        assert is_shut_down(limiter)
+        assert "p" not in limiters.stats()
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_valves_keep_limiter():
+    limiters = PipelineLimiters(default_concurrency=2, default_queue=4)
+    pipeline = FakePipeline(max_concurrency=2)
+    limiter = limiters.get("p", pipeline)
+
+    assert limiters.get("p", pipeline) is limiter
+    assert not is_shut_down(limiter)
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from neo4j_graphrag.types import RetrieverResult, RetrieverResultItem
+
+from utils.graphrag.retrieval_cache import CachedRetriever, RetrievalCache
+
+
+class FixedGraphVersion:
+    def get(self) -> int:
+        return 1
+
+
+class Opaque:
+    """Stands in for neo4j.time.DateTime and friends, which pydantic cannot serialize."""
+
+    def __str__(self) -> str:
+        return "2024-01-01T00:00:00Z"
+
+
+class FakeEmbedder:
+    def embed_query(self, text):
+        return [0.1, 0.2, 0.3]
+
+
+class FakeRetriever:
+    embedder = FakeEmbedder()
+
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, query_vector, **config):
+        self.calls += 1
+        return RetrieverResult(
+            items=[
+                RetrieverResultItem(
+                    content="<node>",
+                    metadata={"properties": {"updated_at": Opaque(), "created": datetime(2024, 1, 1)}},
+                )
+            ]
+        )
+
+
+def make_cache(**kwargs) -> RetrievalCache:
+    return RetrievalCache(FixedGraphVersion(), "index", "RETURN 1", **kwargs)
+
+
+def test_put_serializes_non_json_native_properties():
+    cache = make_cache()
+    retriever = FakeRetriever()
+    key = cache.key([0.1, 0.2, 0.3], {"top_k": 5})
+    cache.put(key, retriever.search([0.1, 0.2, 0.3]))
+
+    cached = cache.get(key)
+    assert cached is not None
+    properties = cached.items[0].metadata["properties"]
+    assert properties["updated_at"] == "2024-01-01T00:00:00Z"
+    assert properties["created"].startswith("2024-01-01")
+
+
+def test_cached_retriever_serves_miss_and_hit():
+    retriever = FakeRetriever()
+    cached = CachedRetriever(retriever, make_cache())
+
+    first = cached.search("query", top_k=5)
+    second = cached.search("query", top_k=5)
+
+    assert first.items[0].content == second.items[0].content == "<node>"
+    assert retriever.calls == 1
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+MANIFOLD = '''
+class Pipeline:
+    def __init__(self):
+        self.type = "manifold"
+        self.name = "Lazy: "
+        self.pipelines = []
+
+    async def on_startup(self):
+        # Like the litellm/ollama manifolds, which fetch their models on startup
+        self.pipelines = [{"id": "model-a", "name": "Model A"}]
+
+    async def on_shutdown(self):
+        pass
+'''
+
+PIPE = '''
+class Pipeline:
+    def __init__(self):
+        self.name = "Pipe"
+
+    async def on_startup(self):
+        %s
+
+    def pipe(self, user_message, model_id, messages, body):
+        return user_message
+'''
+
+
+@pytest.fixture
+def pipelines_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "PIPELINES_DIR", str(tmp_path))
+    yield tmp_path
+    for state in (main.PIPELINE_MODULES, main.PIPELINE_NAMES, main.PIPELINE_FILES, main.STARTUP_REPORT):
+        state.clear()
+    main.REGISTRY.rebuild()
+
+
+def test_registry_includes_pipelines_set_by_startup_hooks(pipelines_dir):
+    (pipelines_dir / "lazy_manifold.py").write_text(MANIFOLD)
+
+    asyncio.run(main.on_startup())
+
+    assert "lazy_manifold.model-a" in main.REGISTRY.pipelines
+    assert main.REGISTRY.pipelines["lazy_manifold.model-a"]["name"] == "Lazy: Model A"
+
+
+def test_reload_keeps_going_when_a_startup_hook_raises(pipelines_dir):
+    (pipelines_dir / "good.py").write_text(PIPE % "pass")
+    asyncio.run(main.on_startup())
+
+    (pipelines_dir / "other.py").write_text(PIPE % "pass")
+    (pipelines_dir / "broken.py").write_text(PIPE % "raise RuntimeError('no backend')")
+    changes = asyncio.run(main.reload())
+
+    assert sorted(changes["added"]) == ["broken", "other"]
+    assert changes["failed"] == {"broken": "no backend"}
+    assert set(main.REGISTRY.pipelines) == {"good", "other"}
+    assert "broken" not in main.PIPELINE_MODULES
+    assert "broken" not in main.PIPELINE_FILES
+    assert main.STARTUP_REPORT["broken"]["status"] == "startup_failed"
+
+    # The failed module was not recorded as loaded, so the next reload starts it again
+    (pipelines_dir / "broken.py").write_text(PIPE % "pass")
+    changes = asyncio.run(main.reload())
+
+    assert changes["added"] == ["broken"]
+    assert changes["failed"] == {}
+    assert set(main.REGISTRY.pipelines) == {"good", "other", "broken"}
+
+
+def test_reload_module_reports_a_raising_startup_hook(pipelines_dir):
+    (pipelines_dir / "flaky.py").write_text(PIPE % "pass")
+    asyncio.run(main.on_startup())
+
+    (pipelines_dir / "flaky.py").write_text(PIPE % "raise RuntimeError('no backend')")
+    assert asyncio.run(main.reload_module("flaky")) is False
+    assert "flaky" not in main.REGISTRY.pipelines
+    assert "flaky" not in main.PIPELINE_FILES
@@ -0,0 +1,357 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+import neo4j
+import numpy as np
+from neo4j import AsyncDriver, Driver, GraphDatabase
+from neo4j_graphrag.embeddings.base import Embedder
+from neo4j_graphrag.types import RetrieverResult, RetrieverResultItem
+
+from utils.graphrag.retrieval_cache import GraphVersion, EMBEDDING_VERSION_QUERY
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+logger = logging.getLogger(__name__)
+
+IDS_FILENAME = "ids.json"
+VECTORS_FILENAME = "vectors.f32"
+HNSW_FILENAME = "hnsw.bin"
+META_FILENAME = "meta.json"
+
+# Below this many vectors a brute-force scan is fast enough and exact
+HNSW_MIN_SIZE = 50_000
+
+INDEX_INFO_QUERY = """
+SHOW INDEXES YIELD name, type, labelsOrTypes, properties
+WHERE name = $index_name AND type = 'VECTOR'
+RETURN labelsOrTypes[0] AS label, properties[0] AS property
+"""
+
+# Seeds found locally replace `CALL db.index.vector.queryNodes(...) YIELD node, score`,
+# so the retrieval query continues exactly as it does after the Neo4j index.
+SEED_QUERY = """
+UNWIND $seeds AS seed_row
+MATCH (node) WHERE elementId(node) = seed_row.id
+WITH node, seed_row.score AS score
+"""
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def export_snapshot(
+    driver: Driver,
+    directory: str,
+    index_name: str = "chunk_vec",
+    batch_size: int = 1000,
+    neo4j_database: Optional[str] = None,
+) -> dict:
+    """
+    Exports the embeddings behind a Neo4j vector index into `directory`:
+    element ids (ids.json), L2-normalised float32 vectors (vectors.f32), an HNSW
+    graph for large corpora when hnswlib is installed (hnsw.bin), and meta.json
+    with the embedding version the snapshot was taken at (see `bump_graph_version`).
+    """
+    records, _, _ = driver.execute_query(
+        INDEX_INFO_QUERY, {"index_name": index_name}, database_=neo4j_database
+    )
+    if not records:
+        raise ValueError(f"Vector index {index_name} not found")
+    label, prop = records[0]["label"], records[0]["property"]
+
+    version_records, _, _ = driver.execute_query(EMBEDDING_VERSION_QUERY, database_=neo4j_database)
+    embedding_version = version_records[0]["version"] if version_records else 0
+
+    os.makedirs(directory, exist_ok=True)
+    vectors_path = os.path.join(directory, VECTORS_FILENAME)
+    ids: List[str] = []
+    dimensions = None
+    with open(vectors_path, "wb") as f, driver.session(database=neo4j_database) as session:
+        result = session.run(
+            f"MATCH (n:`{label}`) WHERE n.`{prop}` IS NOT NULL "
+            f"RETURN elementId(n) AS id, n.`{prop}` AS embedding",
+            fetch_size=batch_size,
+        )
+        batch: List[List[float]] = []
+        for record in result:
+            ids.append(record["id"])
+            batch.append(record["embedding"])
+            if len(batch) >= batch_size:
+                _normalize(np.asarray(batch, dtype=np.float32)).tofile(f)
+                dimensions = len(batch[0])
+                batch = []
+        if batch:
+            _normalize(np.asarray(batch, dtype=np.float32)).tofile(f)
+            dimensions = len(batch[0])
+
+    if not ids:
+        raise ValueError(f"No embeddings found for :{label}({prop})")
+
+    hnsw = False
+    if hnswlib is not None and len(ids) >= HNSW_MIN_SIZE:
+        vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(len(ids), dimensions))
+        index = hnswlib.Index(space="ip", dim=dimensions)
+        index.init_index(max_elements=len(ids), ef_construction=200, M=16)
+        index.add_items(vectors, np.arange(len(ids)))
+        index.save_index(os.path.join(directory, HNSW_FILENAME))
+        hnsw = True
+    elif os.path.exists(os.path.join(directory, HNSW_FILENAME)):
+        os.remove(os.path.join(directory, HNSW_FILENAME))
+
+    with open(os.path.join(directory, IDS_FILENAME), "w") as f:
+        json.dump(ids, f)
+    meta = {
+        "index_name": index_name,
+        "label": label,
+        "property": prop,
+        "count": len(ids),
+        "dimensions": dimensions,
+        "embedding_version": embedding_version,
+        "hnsw": hnsw,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(directory, META_FILENAME), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class LocalVectorIndex:
+    """
+    In-process first-stage index over a snapshot written by `export_snapshot`.
+
+    The vectors are memory-mapped, so several workers share the page cache. Small
+    corpora are searched exactly; when the snapshot has an HNSW graph and hnswlib
+    is installed, that is used instead (it is loaded into memory). Scores follow
+    Neo4j's cosine convention, (1 + cos) / 2, so they stay comparable with
+    `seed_score` from the Neo4j index.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, META_FILENAME)) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, IDS_FILENAME)) as f:
+            self.ids: List[str] = json.load(f)
+
+        # Snapshots from before the embedding version existed always count as stale
+        self.embedding_version = self.meta.get("embedding_version")
+        self.vectors = np.memmap(
+            os.path.join(directory, VECTORS_FILENAME),
+            dtype=np.float32,
+            mode="r",
+            shape=(self.meta["count"], self.meta["dimensions"]),
+        )
+        self.hnsw = None
+        if self.meta.get("hnsw") and hnswlib is not None:
+            self.hnsw = hnswlib.Index(space="ip", dim=self.meta["dimensions"])
+            self.hnsw.load_index(os.path.join(directory, HNSW_FILENAME), max_elements=self.meta["count"])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query_vector: List[float], top_k: int = 5) -> List[Tuple[str, float]]:
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        top_k = min(top_k, len(self.ids))
+
+        if self.hnsw is not None:
+            self.hnsw.set_ef(max(64, top_k * 4))
+            labels, distances = self.hnsw.knn_query(query, k=top_k)
+            # Inner-product distance is 1 - cos
+            indices, similarities = labels[0], 1 - distances[0]
+        else:
+            scores = self.vectors @ query
+            indices = np.argpartition(-scores, top_k - 1)[:top_k]
+            indices = indices[np.argsort(-scores[indices])]
+            similarities = scores[indices]
+
+        return [
+            (self.ids[int(i)], float((1 + similarity) / 2))
+            for i, similarity in zip(indices, similarities)
+        ]
+
+
+class LocalIndexRetriever:
+    """
+    Finds seeds in a LocalVectorIndex and sends only their element ids to Neo4j
+    for the `retrieval_query` expansion, saving the vector index round trip.
+
+    When the embedding version has moved past the snapshot's, searches go to
+    `fallback` (a retriever using the Neo4j index) until a new snapshot is loaded.
+    `embedding_version` is a GraphVersion reading EMBEDDING_VERSION_QUERY; writes
+    that leave embeddings alone, like `materialize refresh`, do not move it.
+    """
+
+    def __init__(
+        self,
+        index: LocalVectorIndex,
+        driver: Driver,
+        embedder: Embedder,
+        retrieval_query: str,
+        fallback: Any,
+        embedding_version: GraphVersion,
+        batch_formatter: Callable[[List[neo4j.Record]], List[RetrieverResultItem]],
+        neo4j_database: Optional[str] = None,
+    ):
+        self.index = index
+        self.driver = driver
+        self.embedder = embedder
+        self.retrieval_query = retrieval_query
+        self.fallback = fallback
+        self.embedding_version = embedding_version
+        self.batch_formatter = batch_formatter
+        self.neo4j_database = neo4j_database
+        self._warned_version = None
+
+    def is_stale(self) -> bool:
+        version = self.embedding_version.get()
+        if version == self.index.embedding_version:
+            return False
+        if self._warned_version != version:
+            self._warned_version = version
+            logger.warning(
+                f"Local vector index snapshot is at embedding version {self.index.embedding_version}, "
+                f"graph is at {version}; using the Neo4j index until it is re-exported"
+            )
+        return True
+
+    def _parameters(self, query_vector: List[float], top_k: int, query_params: Optional[dict]) -> dict:
+        seeds = self.index.search(query_vector, top_k)
+        return {
+            **(query_params or {}),
+            "seeds": [{"id": element_id, "score": score} for element_id, score in seeds],
+        }
+
+    def _result(self, records: List[neo4j.Record]) -> RetrieverResult:
+        return RetrieverResult(
+            items=self.batch_formatter(records),
+            metadata={"__retriever": self.__class__.__name__},
+        )
+
+    def search(
+        self,
+        query_text: Optional[str] = None,
+        query_vector: Optional[List[float]] = None,
+        top_k: int = 5,
+        query_params: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> RetrieverResult:
+        if self.is_stale():
+            return self.fallback.search(
+                query_text=query_text, query_vector=query_vector, top_k=top_k, query_params=query_params, **kwargs
+            )
+        if query_vector is None:
+            query_vector = self.embedder.embed_query(query_text)
+
+        records, _, _ = self.driver.execute_query(
+            f"{SEED_QUERY}{self.retrieval_query}",
+            self._parameters(query_vector, top_k, query_params),
+            database_=self.neo4j_database,
+            routing_=neo4j.RoutingControl.READ,
+        )
+        return self._result(records)
+
+
+class AsyncLocalIndexRetriever(LocalIndexRetriever):
+    """LocalIndexRetriever on the Neo4j async driver; `fallback` must have an async `search`."""
+
+    driver: AsyncDriver
+
+    async def search(
+        self,
+        query_text: Optional[str] = None,
+        query_vector: Optional[List[float]] = None,
+        top_k: int = 5,
+        query_params: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> RetrieverResult:
+        if await asyncio.to_thread(self.is_stale):
+            return await self.fallback.search(
+                query_text=query_text, query_vector=query_vector, top_k=top_k, query_params=query_params, **kwargs
+            )
+        if query_vector is None:
+            query_vector = await asyncio.to_thread(self.embedder.embed_query, query_text)
+
+        parameters = await asyncio.to_thread(self._parameters, query_vector, top_k, query_params)
+        records, _, _ = await self.driver.execute_query(
+            f"{SEED_QUERY}{self.retrieval_query}",
+            parameters,
+            database_=self.neo4j_database,
+            routing_=neo4j.RoutingControl.READ,
+        )
+        return self._result(records)
+
+
+def snapshot_status(driver: Driver, directory: str, neo4j_database: Optional[str] = None) -> dict:
+    """The snapshot's metadata next to the graph's current embedding version and node count."""
+    with open(os.path.join(directory, META_FILENAME)) as f:
+        meta = json.load(f)
+    version_records, _, _ = driver.execute_query(EMBEDDING_VERSION_QUERY, database_=neo4j_database)
+    count_records, _, _ = driver.execute_query(
+        f"MATCH (n:`{meta['label']}`) WHERE n.`{meta['property']}` IS NOT NULL RETURN count(n) AS count",
+        database_=neo4j_database,
+    )
+    embedding_version = version_records[0]["version"] if version_records else 0
+    graph_count = count_records[0]["count"]
+    return {
+        **meta,
+        "embedding_version_current": embedding_version,
+        "count_current": graph_count,
+        "stale": embedding_version != meta.get("embedding_version") or graph_count != meta["count"],
+    }
+
+
+def load_local_index(directory: str) -> Optional[LocalVectorIndex]:
+    """Loads a snapshot if `directory` holds one; failures disable the local index instead of raising."""
+    if not directory or not os.path.exists(os.path.join(directory, META_FILENAME)):
+        return None
+    try:
+        index = LocalVectorIndex(directory)
+    except Exception as e:
+        logger.warning(f"Could not load local vector index from {directory}: {e}")
+        return None
+    logger.info(
+        f"Loaded local vector index with {len(index)} vectors "
+        f"({'hnsw' if index.hnsw is not None else 'exact'}) from {directory}"
+    )
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Manage the local snapshot of a Neo4j vector index. Re-export after every ingestion that "
+        "writes embeddings, once `retrieval_cache bump` has run; `materialize refresh` does not require it."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser(
+        "export", help="Export the index embeddings; re-run after each ingestion that writes embeddings."
+    )
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+    subparsers.add_parser("status", help="Compare the snapshot with the embedding version and node count.")
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("directory", nargs="?", default=os.getenv("LOCAL_ANN_PATH", ""))
+        subparser.add_argument("--index", default="chunk_vec")
+        subparser.add_argument("--database", default=None)
+    args = parser.parse_args()
+    if not args.directory:
+        parser.error("no snapshot directory given and LOCAL_ANN_PATH is not set")
+
+    driver = GraphDatabase.driver(
+        uri=os.getenv("NEO4J_URI", "neo4j+s://e0a0bc0d.databases.neo4j.io"),
+        auth=(os.getenv("NEO4J_USERNAME", ""), os.getenv("NEO4J_PASSWORD", "")),
+    )
+    with driver:
+        if args.command == "export":
+            meta = export_snapshot(driver, args.directory, args.index, args.batch_size, args.database)
+            print(json.dumps(meta, indent=2))
+        elif args.command == "status":
+            print(json.dumps(snapshot_status(driver, args.directory, args.database), indent=2))
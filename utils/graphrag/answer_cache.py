@@ -0,0 +1,156 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from utils.pipelines.metrics import METRICS
+
+
+ANSWER_CACHE_REQUESTS = METRICS.counter(
+    "graphrag_answer_cache_requests_total",
+    "Semantic answer cache lookups by result (hit, miss, bypass).",
+    ["result"],
+)
+ANSWER_CACHE_SIMILARITY = METRICS.histogram(
+    "graphrag_answer_cache_hit_similarity",
+    "Cosine similarity between the query and the cached query it matched.",
+    buckets=(0.9, 0.92, 0.94, 0.95, 0.96, 0.97, 0.98, 0.99, 1.0),
+)
+
+
+def _unit(vector: List[float]) -> Tuple[float, ...]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return tuple(x / norm for x in vector) if norm else tuple(vector)
+
+
+def context_key(*parts: str) -> str:
+    """Hashes the non-query inputs of an answer (user context, template, retriever settings)."""
+    sha256 = hashlib.sha256()
+    for part in parts:
+        sha256.update(part.encode("utf-8"))
+        sha256.update(b"\0")
+    return sha256.hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Generated answers keyed by the query embedding and a hash of everything else
+    that went into the prompt (see `context_key`).
+
+    `lookup` returns the answer of the most similar cached query with the same
+    context, provided its cosine similarity is at least `threshold`. Entries
+    expire after `ttl` seconds, and the least recently used ones are evicted
+    beyond `max_size`. A user's entries can be dropped with `invalidate` when
+    their roster, sleep or exercise data changes; until then, changed data only
+    changes the context hash, so stale entries stop matching and age out.
+
+    Example:
+
+    .. code-block:: python
+
+      cache = SemanticAnswerCache(threshold=0.95)
+      key = context_key(user_info_str, roster_info_str, exercise_info_str, sleep_info_str)
+      answer = cache.lookup(embedder.embed_query(query_text), key)
+    """
+
+    def __init__(self, threshold: float = 0.95, max_size: int = 1000, ttl: float = 3600):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # entry id -> (expires_at, context key, unit query vector, answer, user id)
+        self._entries: "OrderedDict[int, Tuple[float, str, Tuple[float, ...], str, Any]]" = OrderedDict()
+        self._contexts: Dict[str, Set[int]] = {}
+        self._users: Dict[Any, Set[int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+        METRICS.gauge(
+            "graphrag_answer_cache_entries",
+            "Answers held in the semantic answer cache.",
+            collect=lambda: {(): len(self)},
+        )
+        METRICS.gauge(
+            "graphrag_answer_cache_hit_ratio",
+            "Share of semantic answer cache lookups answered from the cache since startup.",
+            collect=lambda: {(): self.hit_ratio()},
+        )
+
+    def lookup(self, query_vector: List[float], context: str) -> Optional[str]:
+        query = _unit(query_vector)
+        now = time.monotonic()
+        best_id, best_similarity = None, self.threshold
+        with self._lock:
+            for entry_id in list(self._contexts.get(context, ())):
+                expires_at, _, vector, _, _ = self._entries[entry_id]
+                if expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                similarity = sum(x * y for x, y in zip(query, vector))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                self.misses += 1
+                ANSWER_CACHE_REQUESTS.inc(result="miss")
+                return None
+            self._entries.move_to_end(best_id)
+            answer = self._entries[best_id][3]
+            self.hits += 1
+        ANSWER_CACHE_REQUESTS.inc(result="hit")
+        ANSWER_CACHE_SIMILARITY.observe(best_similarity)
+        return answer
+
+    def save(self, query_vector: List[float], context: str, answer: str, user_id: Any = None):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (time.monotonic() + self.ttl, context, _unit(query_vector), answer, user_id)
+            self._contexts.setdefault(context, set()).add(entry_id)
+            if user_id is not None:
+                self._users.setdefault(user_id, set()).add(entry_id)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id: Any) -> int:
+        """Drops every answer cached for `user_id`; returns how many were removed."""
+        with self._lock:
+            entry_ids = list(self._users.get(user_id, ()))
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+        return len(entry_ids)
+
+    def _remove(self, entry_id: int):
+        _, context, _, _, user_id = self._entries.pop(entry_id)
+        for index, key in ((self._contexts, context), (self._users, user_id)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del index[key]
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._contexts.clear()
+            self._users.clear()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio(),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
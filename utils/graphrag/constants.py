@@ -1,32 +1,50 @@
 # Params:
 # $limit     : INTEGER  optional cap on returned nodes (e.g. 200)
-QUERY_TEMPLATE = """
+# Each node is returned once, with the best vector score among the seeds that
+# reach it (seed_score) and its fewest hops from a seed (hop_distance), so the
+# context packer can rank them; the best-ranked nodes survive the LIMIT.
+_FIRST_HOPS = """
 WITH node AS seed, score
-WITH collect(seed) AS seeds
-OPTIONAL MATCH (seed)-[]-(a:sop) WHERE seed IN seeds
-WITH seeds, collect(DISTINCT a) AS A
-OPTIONAL MATCH (seed)-[]-(c:rp_claim) WHERE seed IN seeds
-WITH seeds, A, collect(DISTINCT c) AS C
-WITH seeds, A, C,
+OPTIONAL MATCH (seed)-[]-(a:sop)
+WITH seed, score, collect(DISTINCT a) AS A
+OPTIONAL MATCH (seed)-[]-(c:rp_claim)
+WITH seed, score, A, collect(DISTINCT c) AS C
+WITH collect({score: score, A: A, C: C}) AS seeds
+WITH seeds,
      CASE
-       WHEN size(A) > 0 THEN 'sop'
-       WHEN size(C) > 0 THEN 'rp_claim'
+       WHEN any(s IN seeds WHERE size(s.A) > 0) THEN 'sop'
+       WHEN any(s IN seeds WHERE size(s.C) > 0) THEN 'rp_claim'
        ELSE NULL
      END AS chosen
-WITH
-  CASE chosen
-    WHEN 'sop' THEN A
-    WHEN 'rp_claim' THEN C
-    ELSE []
-  END AS firstHops,
-  chosen
-WHERE size(firstHops) > 0
-UNWIND firstHops AS h1
-MATCH p=(h1)-[*1..2]-(n)
-RETURN DISTINCT n AS node, chosen AS chosen_first_hop_label
+WHERE chosen IS NOT NULL
+UNWIND seeds AS s
+UNWIND CASE chosen WHEN 'sop' THEN s.A ELSE s.C END AS h1
+WITH chosen, h1, max(s.score) AS seed_score
+"""
+
+_RANKED_NODES = """
+WITH n, chosen, max(seed_score) AS seed_score, min(hops) + 1 AS hop_distance
+RETURN n AS node, chosen AS chosen_first_hop_label, seed_score, hop_distance
+ORDER BY seed_score DESC, hop_distance ASC
 LIMIT coalesce($limit, 100);
 """
 
+QUERY_TEMPLATE = _FIRST_HOPS + """
+MATCH p=(h1)-[*1..2]-(n)
+WHERE NOT n:_Neighbourhood
+WITH n, chosen, seed_score, length(p) AS hops
+""" + _RANKED_NODES
+
+# Same result as QUERY_TEMPLATE, but reads each first hop's 2-hop neighbourhood from
+# the _Neighbourhood node written by utils.graphrag.materialize instead of
+# traversing it. Only valid while the materialization is fresh.
+MATERIALIZED_QUERY_TEMPLATE = _FIRST_HOPS + """
+MATCH (h1)<-[:_NEIGHBOURHOOD_OF]-(nb:_Neighbourhood)
+UNWIND range(0, size(nb.ids) - 1) AS i
+WITH chosen, seed_score, nb.ids[i] AS neighbour_id, nb.hops[i] AS hops
+MATCH (n) WHERE elementId(n) = neighbour_id
+""" + _RANKED_NODES
+
 DEFAULT_PROMPT="Hi, I am facing above average fatigue levels recently. Can you help me with some recommendations to manage my fatigue?"
 
 PROMPT_TEMPLATE = (
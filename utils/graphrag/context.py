@@ -0,0 +1,108 @@
+import logging
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from neo4j_graphrag.types import RetrieverResultItem
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # The encoding files are downloaded on first use and may be unavailable offline
+        logger.warning(f"tiktoken encoding {name} unavailable, estimating tokens instead: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding: str = "o200k_base") -> int:
+    """Counts tokens with tiktoken, or estimates four characters per token without it."""
+    enc = _get_encoding(encoding)
+    if enc is None:
+        return len(text) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def item_element_id(item: RetrieverResultItem) -> Optional[str]:
+    """The element_id of the node an item was formatted from (see generic_result_formatter)."""
+    for value in (item.metadata or {}).values():
+        if isinstance(value, dict) and value.get("type") == "node":
+            return value.get("element_id")
+    return None
+
+
+def item_rank(item: RetrieverResultItem) -> Tuple[float, float]:
+    """Sort key: highest seed score first, then the fewest hops from the seed."""
+    metadata = item.metadata or {}
+    seed_score = metadata.get("seed_score")
+    hop_distance = metadata.get("hop_distance")
+    return (
+        -seed_score if isinstance(seed_score, (int, float)) else 0.0,
+        hop_distance if isinstance(hop_distance, (int, float)) else float("inf"),
+    )
+
+
+class ContextPacker:
+    """
+    Builds the prompt context from retriever items within a token budget.
+
+    Items are deduplicated by node element_id (the same node is often reached by
+    several paths), ranked by seed score and hop distance, and added in that
+    order while they fit in `max_tokens`. Items that do not fit are skipped, so
+    a smaller lower-ranked item can still use the remaining budget.
+
+    Example:
+
+    .. code-block:: python
+
+      context, stats = ContextPacker(max_tokens=3000).pack(retriever_result.items)
+    """
+
+    def __init__(self, max_tokens: int = 4000, encoding: str = "o200k_base", separator: str = "\n"):
+        self.max_tokens = max_tokens
+        self.encoding = encoding
+        self.separator = separator
+
+    def count_tokens(self, text: str) -> int:
+        return count_tokens(text, self.encoding)
+
+    def pack(self, items: List[RetrieverResultItem]) -> Tuple[str, Dict[str, Any]]:
+        unique: Dict[Any, Tuple[int, RetrieverResultItem]] = {}
+        for index, item in enumerate(items):
+            # Items without a node keep their own slot
+            key = item_element_id(item) or ("item", index)
+            known = unique.get(key)
+            if known is None or item_rank(item) < item_rank(known[1]):
+                unique[key] = (index, item)
+
+        ranked = sorted(unique.values(), key=lambda entry: (item_rank(entry[1]), entry[0]))
+
+        separator_tokens = self.count_tokens(self.separator)
+        packed: List[str] = []
+        tokens = 0
+        for _, item in ranked:
+            content = str(item.content)
+            item_tokens = self.count_tokens(content) + (separator_tokens if packed else 0)
+            if tokens + item_tokens > self.max_tokens:
+                continue
+            packed.append(content)
+            tokens += item_tokens
+
+        stats = {
+            "context_items": len(items),
+            "context_duplicates": len(items) - len(unique),
+            "context_packed": len(packed),
+            "context_dropped": len(unique) - len(packed),
+            "context_tokens": tokens,
+        }
+        return self.separator.join(packed), stats
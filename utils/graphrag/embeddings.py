@@ -0,0 +1,227 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from neo4j_graphrag.embeddings.base import Embedder
+
+from utils.pipelines.embeddings import EMBEDDING_MODELS, EmbeddingModelRegistry
+from utils.pipelines.metrics import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_REQUESTS = METRICS.counter(
+    "graphrag_embedding_cache_requests_total",
+    "Query embedding lookups by model and result (hit, disk_hit, miss).",
+    ["model", "result"],
+)
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so trivially different prompts share a cache entry."""
+    return " ".join(text.split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """
+    SQLite tier for CachedEmbedder. Vectors are stored as packed float32, and the
+    oldest rows are pruned once the store grows past `max_size`.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_size: int = 100_000):
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, created REAL NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def put(self, key: str, model_name: str, vector: List[float]):
+        blob = array("f", vector).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, created, vector) VALUES (?, ?, ?, ?)",
+                (key, model_name, time.time(), blob),
+            )
+            self._inserts += 1
+            if self._inserts % self.PRUNE_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_size,),
+                )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbedder(Embedder):
+    """
+    Wraps an Embedder with a cache of query embeddings.
+
+    Entries are keyed on the model name and the whitespace-normalised text. The
+    in-memory tier is an LRU bounded by `max_size` entries and `ttl` seconds; if
+    `disk_path` is set, misses fall back to a SQLite store shared across restarts
+    before the wrapped embedder is called.
+
+    Example:
+
+    .. code-block:: python
+
+      embedder = CachedEmbedder(
+          SentenceTransformerEmbeddings(model="intfloat/e5-base-v2"),
+          model_name="intfloat/e5-base-v2",
+      )
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        model_name: str,
+        max_size: int = 1024,
+        ttl: float = 3600,
+        disk_path: Optional[str] = None,
+        disk_max_size: int = 100_000,
+    ):
+        super().__init__()
+        self.embedder = embedder
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk = DiskEmbeddingStore(disk_path, disk_max_size) if disk_path else None
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        key = cache_key(self.model_name, text)
+
+        vector = self._get(key)
+        if vector is not None:
+            self.hits += 1
+            EMBEDDING_CACHE_REQUESTS.inc(model=self.model_name, result="hit")
+            return vector
+
+        if self.disk:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.disk_hits += 1
+                EMBEDDING_CACHE_REQUESTS.inc(model=self.model_name, result="disk_hit")
+                self._put(key, vector)
+                return vector
+
+        self.misses += 1
+        EMBEDDING_CACHE_REQUESTS.inc(model=self.model_name, result="miss")
+        vector = self.embedder.embed_query(text)
+        self._put(key, vector)
+        if self.disk:
+            try:
+                self.disk.put(key, self.model_name, vector)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist embedding to {self.disk.path}: {e}")
+        return vector
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, vector = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _put(self, key: str, vector: List[float]):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+    def close(self):
+        if self.disk:
+            self.disk.close()
+        close = getattr(self.embedder, "close", None)
+        if close:
+            close()
+
+
+class SharedSentenceTransformerEmbeddings(Embedder):
+    """
+    SentenceTransformerEmbeddings backed by the process-wide EMBEDDING_MODELS
+    registry, so the pipelines server and every pipeline share one copy of the
+    weights. Queries go through the model's EmbeddingBatcher, batched with
+    concurrent queries from other requests. `close` gives the model back to the
+    registry.
+    """
+
+    def __init__(
+        self,
+        model: str = "all-MiniLM-L6-v2",
+        registry: Optional[EmbeddingModelRegistry] = None,
+        **kwargs: Any,
+    ):
+        super().__init__()
+        self.registry = registry or EMBEDDING_MODELS
+        self.model_name = model
+        self.model_kwargs = kwargs
+        self.model = self.registry.acquire(model, **kwargs)
+        self.batcher = self.registry.batcher(model, **kwargs)
+        self._closed = False
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.encode(text)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.registry.release(self.model_name, **self.model_kwargs)
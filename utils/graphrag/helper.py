@@ -1,6 +1,6 @@
 from neo4j_graphrag.retrievers.base import RetrieverResultItem
 
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 try:
     # Neo4j Python driver v5 types (optional import guard)
     from neo4j.graph import Node, Relationship, Path
@@ -109,6 +109,144 @@ def generic_result_formatter(record) -> "RetrieverResultItem":
     content = "\n".join(content_lines)
     return RetrieverResultItem(content=content, metadata=metadata)
 
+def _is_node(value) -> bool:
+    return isinstance(value, Node) or hasattr(value, "labels")
+
+def _is_relationship(value) -> bool:
+    return isinstance(value, Relationship) or hasattr(value, "type")
+
+def _is_path(value) -> bool:
+    return isinstance(value, Path) or (hasattr(value, "nodes") and hasattr(value, "relationships"))
+
+class BatchResultFormatter:
+    """
+    Formats a whole result set at once, with the same output as generic_result_formatter.
+
+    - The rendering strategy for each column is picked once per record layout
+      (keys and value types) instead of probing every value.
+    - Each node is rendered once per batch, memoized by element_id.
+    - `properties`, if given, limits the node and relationship properties that
+      are rendered and kept in the metadata.
+
+    Usable as a per-record `result_formatter` too, without the per-batch memo.
+    """
+
+    def __init__(self, properties: Optional[Iterable[str]] = None):
+        self.properties = tuple(properties) if properties is not None else None
+        self._strategies: Dict[Tuple, List[Tuple[str, Callable]]] = {}
+
+    def __call__(self, record) -> RetrieverResultItem:
+        return self.format_batch([record])[0]
+
+    def format_batch(self, records: Iterable) -> List[RetrieverResultItem]:
+        nodes: Dict[Any, Tuple[str, Dict[str, Any]]] = {}
+        items = []
+        for record in records:
+            keys = tuple(record.keys())
+            values = tuple(record.values())
+            layout = (keys, tuple(type(value) for value in values))
+            strategy = self._strategies.get(layout)
+            if strategy is None:
+                strategy = self._strategies[layout] = [
+                    (key, self._renderer_for(value)) for key, value in zip(keys, values)
+                ]
+
+            chunks = []
+            metadata: Dict[str, Any] = {}
+            for (key, render), value in zip(strategy, values):
+                chunk, metadata[key] = render(key, value, nodes)
+                chunks.append(chunk)
+            items.append(RetrieverResultItem(content="\n".join(chunks), metadata=metadata))
+        return items
+
+    def _renderer_for(self, value) -> Callable:
+        if _is_node(value):
+            return self._render_node
+        if _is_relationship(value):
+            return self._render_relationship
+        if _is_path(value):
+            return self._render_path
+        if isinstance(value, list):
+            return self._render_list
+        if isinstance(value, dict):
+            return self._render_map
+        return self._render_primitive
+
+    def _props(self, value) -> Dict[str, Any]:
+        if self.properties is None:
+            return dict(value)
+        return {k: value[k] for k in self.properties if k in value}
+
+    def _render_props(self, props: Dict[str, Any]) -> str:
+        return "".join(f"\n- {k}: {v}" for k, v in props.items())
+
+    def _render_node(self, key, value, nodes):
+        element_id = getattr(value, "element_id", None)
+        memo_key = element_id if element_id is not None else id(value)
+        rendered = nodes.get(memo_key)
+        if rendered is None:
+            labels = sorted(getattr(value, "labels", []))
+            props = self._props(value)
+            rendered = nodes[memo_key] = (
+                f"### Node `:{':'.join(labels)}`\n- element_id: {element_id}{self._render_props(props)}\n",
+                {
+                    "type": "node",
+                    "labels": labels,
+                    "element_id": element_id,
+                    "properties": props,
+                },
+            )
+        return rendered
+
+    def _render_relationship(self, key, value, nodes):
+        rel_type = getattr(value, "type", None)
+        start_eid = getattr(value, "start_node_element_id", None)
+        end_eid = getattr(value, "end_node_element_id", None)
+        props = self._props(value)
+        chunk = f"### Relationship `:{rel_type}`"
+        if start_eid is not None:
+            chunk += f"\n- start_node_element_id: {start_eid}"
+        if end_eid is not None:
+            chunk += f"\n- end_node_element_id: {end_eid}"
+        return f"{chunk}{self._render_props(props)}\n", {
+            "type": "relationship",
+            "rel_type": rel_type,
+            "start_node_element_id": start_eid,
+            "end_node_element_id": end_eid,
+            "properties": props,
+        }
+
+    def _render_path(self, key, value, nodes):
+        chunk = f"### Path\n- length: {len(value.relationships)}"
+        try:
+            node_ids = [getattr(n, "element_id", None) for n in value.nodes]
+            rel_types = [getattr(r, "type", None) for r in value.relationships]
+            chunk += f"\n- node_element_ids: {node_ids}\n- relationship_types: {rel_types}"
+        except Exception:
+            pass
+        return f"{chunk}\n", {
+            "type": "path",
+            "length": len(getattr(value, "relationships", [])),
+        }
+
+    def _render_list(self, key, value, nodes):
+        preview = []
+        for item in value[:10]:
+            if _is_node(item):
+                preview.append({"node": {"labels": sorted(getattr(item, "labels", [])),
+                                         "element_id": getattr(item, "element_id", None)}})
+            elif _is_relationship(item):
+                preview.append({"relationship": {"type": getattr(item, "type", None)}})
+            else:
+                preview.append(item)
+        return f"- {key} (list, preview): {preview}\n", {"type": "list", "size": len(value)}
+
+    def _render_map(self, key, value, nodes):
+        return f"### Map `{key}`{self._render_props(value)}\n", {"type": "map", "size": len(value)}
+
+    def _render_primitive(self, key, value, nodes):
+        return f"- {key}: {value}\n", value
+
 def parse_user_info(user_info: dict) -> str:
     """
     Parses user information dictionary into a formatted string.
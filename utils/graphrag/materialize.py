@@ -0,0 +1,102 @@
+import argparse
+import os
+import time
+from typing import Optional
+
+from neo4j import Driver, GraphDatabase
+
+from utils.graphrag.retrieval_cache import bump_graph_version
+
+# For every first-hop node, store the element ids of the nodes within 2 hops and
+# the fewest hops to each, as parallel lists read by MATERIALIZED_QUERY_TEMPLATE.
+# They live on a separate (:_Neighbourhood)-[:_NEIGHBOURHOOD_OF]->(h) node, so the
+# retrieval queries never return them as part of h; both traversals skip these nodes.
+# Properties left on h by earlier versions of this module are removed.
+REFRESH_QUERY = """
+MATCH (h)
+WHERE h:sop OR h:rp_claim
+CALL {
+  WITH h
+  OPTIONAL MATCH p=(h)-[*1..2]-(n)
+  WHERE NOT n:_Neighbourhood
+  WITH h, n, min(length(p)) AS hops
+  WITH h, collect(elementId(n)) AS ids, collect(hops) AS hop_list
+  MERGE (h)<-[:_NEIGHBOURHOOD_OF]-(nb:_Neighbourhood)
+  SET nb.ids = ids,
+      nb.hops = hop_list,
+      nb.refreshed_at = datetime()
+  REMOVE h.nbr_2hop_ids, h.nbr_2hop_hops, h.nbr_2hop_refreshed_at
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+CLEAR_QUERY = """
+MATCH (nb:_Neighbourhood)
+CALL {
+  WITH nb
+  DETACH DELETE nb
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+STATUS_QUERY = """
+MATCH (h)
+WHERE h:sop OR h:rp_claim
+OPTIONAL MATCH (h)<-[:_NEIGHBOURHOOD_OF]-(nb:_Neighbourhood)
+RETURN count(h) AS first_hops,
+       count(nb) AS materialized,
+       avg(size(nb.ids)) AS avg_neighbours,
+       min(nb.refreshed_at) AS oldest_refresh
+"""
+
+
+def refresh(driver: Driver, batch_size: int = 500, neo4j_database: Optional[str] = None) -> float:
+    """
+    Recomputes the 2-hop neighbourhood of every first-hop node.
+
+    Run after each ingestion, like `retrieval_cache bump`: the materialized query
+    returns stale neighbourhoods until then. The graph version is bumped at the
+    end, so cached retrieval results are dropped too. The embedding version is
+    left alone, so a local ANN snapshot stays in use; re-export it only when the
+    ingestion itself wrote embeddings.
+    """
+    start_time = time.perf_counter()
+    # CALL ... IN TRANSACTIONS needs an implicit (auto-commit) transaction
+    with driver.session(database=neo4j_database) as session:
+        session.run(REFRESH_QUERY, batch_size=batch_size).consume()
+    bump_graph_version(driver, neo4j_database, embeddings_changed=False)
+    return time.perf_counter() - start_time
+
+
+def clear(driver: Driver, batch_size: int = 500, neo4j_database: Optional[str] = None):
+    with driver.session(database=neo4j_database) as session:
+        session.run(CLEAR_QUERY, batch_size=batch_size).consume()
+    bump_graph_version(driver, neo4j_database, embeddings_changed=False)
+
+
+def status(driver: Driver, neo4j_database: Optional[str] = None) -> dict:
+    records, _, _ = driver.execute_query(STATUS_QUERY, database_=neo4j_database)
+    return dict(records[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Materialize the 2-hop neighbourhoods of sop/rp_claim nodes for MATERIALIZED_QUERY_TEMPLATE. "
+        "After an ingestion, run `utils.graphrag.ann export` (if it wrote embeddings) and this refresh, in either "
+        "order; the refresh does not invalidate the local ANN snapshot."
+    )
+    parser.add_argument("command", choices=["refresh", "clear", "status"])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database", default=None)
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(
+        uri=os.getenv("NEO4J_URI", "neo4j+s://e0a0bc0d.databases.neo4j.io"),
+        auth=(os.getenv("NEO4J_USERNAME", ""), os.getenv("NEO4J_PASSWORD", "")),
+    )
+    with driver:
+        if args.command == "refresh":
+            elapsed = refresh(driver, args.batch_size, args.database)
+            print(f"Refreshed 2-hop neighbourhoods in {elapsed:.1f}s")
+        elif args.command == "clear":
+            clear(driver, args.batch_size, args.database)
+            print("Removed materialized neighbourhoods")
+        print(status(driver, args.database))
@@ -0,0 +1,285 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, List, Optional
+
+from neo4j import Driver, GraphDatabase
+from neo4j_graphrag.types import RetrieverResult
+
+from utils.pipelines.metrics import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_CACHE_REQUESTS = METRICS.counter(
+    "graphrag_retrieval_cache_requests_total",
+    "Retrieval cache lookups by result (hit, miss).",
+    ["result"],
+)
+
+GRAPH_VERSION_QUERY = "MATCH (v:_GraphVersion {id: 'graph'}) RETURN v.version AS version"
+# Only moves when embeddings were written; local ANN snapshots are stamped with it
+EMBEDDING_VERSION_QUERY = (
+    "MATCH (v:_GraphVersion {id: 'graph'}) RETURN coalesce(v.embedding_version, 0) AS version"
+)
+BUMP_GRAPH_VERSION_QUERY = """
+MERGE (v:_GraphVersion {id: 'graph'})
+SET v.version = coalesce(v.version, 0) + 1,
+    v.embedding_version = coalesce(v.embedding_version, 0) + CASE WHEN $embeddings_changed THEN 1 ELSE 0 END,
+    v.updated_at = datetime()
+RETURN v.version AS version
+"""
+
+
+class GraphVersion:
+    """
+    The version stamp of the graph, read from the `_GraphVersion` node.
+
+    Ingestion bumps it (see `bump_graph_version`) after writing to the graph.
+    The value is re-read at most every `refresh_interval` seconds, which bounds
+    how long stale retrieval results can be served after an ingestion. Pass
+    `query=EMBEDDING_VERSION_QUERY` to follow the embedding version instead.
+    """
+
+    def __init__(
+        self,
+        driver: Driver,
+        refresh_interval: float = 30,
+        neo4j_database: Optional[str] = None,
+        query: str = GRAPH_VERSION_QUERY,
+    ):
+        self.driver = driver
+        self.query = query
+        self.refresh_interval = refresh_interval
+        self.neo4j_database = neo4j_database
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._fetched_at = 0.0
+
+    def get(self) -> int:
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._fetched_at < self.refresh_interval:
+                return self._version
+            try:
+                records, _, _ = self.driver.execute_query(
+                    self.query, database_=self.neo4j_database
+                )
+                self._version = records[0]["version"] if records else 0
+            except Exception as e:
+                # Keep serving with the last known version; retrieval will surface real outages
+                logger.warning(f"Could not read the graph version: {e}")
+                if self._version is None:
+                    self._version = 0
+            self._fetched_at = time.monotonic()
+            return self._version
+
+
+def bump_graph_version(
+    driver: Driver, neo4j_database: Optional[str] = None, embeddings_changed: bool = True
+) -> int:
+    """
+    Invalidates every cached retrieval result. Call after ingesting into the graph.
+
+    Pass `embeddings_changed=False` for writes that leave chunk embeddings alone
+    (such as `materialize refresh`), so local ANN snapshots stay in use; otherwise
+    they fall back to the Neo4j index until `python -m utils.graphrag.ann export`
+    is re-run.
+    """
+    records, _, _ = driver.execute_query(
+        BUMP_GRAPH_VERSION_QUERY, {"embeddings_changed": embeddings_changed}, database_=neo4j_database
+    )
+    return records[0]["version"]
+
+
+def quantize(vector: List[float], step: float = 0.01) -> bytes:
+    """Rounds an embedding onto a grid of `step`, so near-identical queries share a key."""
+    return array("i", (round(x / step) for x in vector)).tobytes()
+
+
+class RetrievalCache:
+    """
+    Retrieval results keyed by the quantized query embedding, the retriever
+    configuration, the retrieval query and the graph version.
+
+    Results are kept in SQLite so several processes (the pipelines server and the
+    backend) can share one cache file; `path=None` keeps the cache in memory.
+    Entries expire after `ttl` seconds, and the least recently used ones are
+    dropped once there are more than `max_size`.
+    """
+
+    PRUNE_EVERY = 50
+
+    def __init__(
+        self,
+        graph_version: GraphVersion,
+        index_name: str,
+        retrieval_query: str,
+        path: Optional[str] = None,
+        max_size: int = 1000,
+        ttl: float = 3600,
+        step: float = 0.01,
+    ):
+        self.graph_version = graph_version
+        self.max_size = max_size
+        self.ttl = ttl
+        self.step = step
+        self.path = path or ":memory:"
+        # Results from a different index or Cypher template must never be shared
+        self._namespace = hashlib.sha256(f"{index_name}\0{retrieval_query}".encode("utf-8")).hexdigest()
+
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS retrieval_cache ("
+            "key TEXT PRIMARY KEY, created REAL NOT NULL, accessed REAL NOT NULL, result TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS retrieval_cache_accessed ON retrieval_cache (accessed)"
+        )
+        self._conn.commit()
+
+    def key(self, query_vector: List[float], retriever_config: dict[str, Any]) -> str:
+        sha256 = hashlib.sha256(self._namespace.encode("utf-8"))
+        sha256.update(str(self.graph_version.get()).encode("utf-8"))
+        sha256.update(json.dumps(retriever_config, sort_keys=True, default=str).encode("utf-8"))
+        sha256.update(quantize(query_vector, self.step))
+        return sha256.hexdigest()
+
+    def get(self, key: str) -> Optional[RetrieverResult]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created, result FROM retrieval_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] + self.ttl < now:
+                self._conn.execute("DELETE FROM retrieval_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                RETRIEVAL_CACHE_REQUESTS.inc(result="miss")
+                return None
+            self._conn.execute("UPDATE retrieval_cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        RETRIEVAL_CACHE_REQUESTS.inc(result="hit")
+        return RetrieverResult.model_validate_json(row[1])
+
+    def put(self, key: str, result: RetrieverResult):
+        if self.max_size <= 0:
+            return
+        try:
+            # Node properties may hold neo4j temporal or spatial values, which
+            # pydantic cannot serialize; they come back from the cache as strings
+            payload = json.dumps(result.model_dump(), default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Not caching a retrieval result that cannot be serialized: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO retrieval_cache (key, created, accessed, result) VALUES (?, ?, ?, ?)",
+                (key, now, now, payload),
+            )
+            self._inserts += 1
+            if self._inserts % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM retrieval_cache WHERE created < ?", (now - self.ttl,))
+                self._conn.execute(
+                    "DELETE FROM retrieval_cache WHERE key IN ("
+                    "SELECT key FROM retrieval_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_size,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM retrieval_cache")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedRetriever:
+    """
+    Puts a RetrievalCache in front of a retriever that accepts `query_vector`,
+    such as VectorCypherRetriever. The query is embedded once, through the
+    retriever's own embedder, and the vector is reused on a miss.
+    """
+
+    def __init__(self, retriever: Any, cache: RetrievalCache):
+        self.retriever = retriever
+        self.cache = cache
+        self.embedder = retriever.embedder
+
+    def search(
+        self,
+        query_text: Optional[str] = None,
+        query_vector: Optional[List[float]] = None,
+        **retriever_config: Any,
+    ) -> RetrieverResult:
+        if query_vector is None:
+            query_vector = self.embedder.embed_query(query_text)
+
+        key = self.cache.key(query_vector, retriever_config)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.retriever.search(query_vector=query_vector, **retriever_config)
+            self.cache.put(key, result)
+        return result
+
+
+class AsyncCachedRetriever(CachedRetriever):
+    """CachedRetriever for retrievers with an async `search`, like AsyncVectorCypherRetriever."""
+
+    async def search(
+        self,
+        query_text: Optional[str] = None,
+        query_vector: Optional[List[float]] = None,
+        **retriever_config: Any,
+    ) -> RetrieverResult:
+        if query_vector is None:
+            query_vector = await asyncio.to_thread(self.embedder.embed_query, query_text)
+
+        key = await asyncio.to_thread(self.cache.key, query_vector, retriever_config)
+        result = await asyncio.to_thread(self.cache.get, key)
+        if result is None:
+            result = await self.retriever.search(query_vector=query_vector, **retriever_config)
+            await asyncio.to_thread(self.cache.put, key, result)
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the GraphRAG retrieval cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser(
+        "bump",
+        help="Bump the graph version after an ingestion, invalidating cached results; "
+        "re-run `utils.graphrag.ann export` afterwards if LOCAL_ANN_PATH is used.",
+    )
+    clear_parser = subparsers.add_parser("clear", help="Delete every entry of a cache file.")
+    clear_parser.add_argument("path", nargs="?", default=os.getenv("RETRIEVAL_CACHE_PATH", ""))
+    args = parser.parse_args()
+
+    if args.command == "bump":
+        driver = GraphDatabase.driver(
+            uri=os.getenv("NEO4J_URI", "neo4j+s://e0a0bc0d.databases.neo4j.io"),
+            auth=(os.getenv("NEO4J_USERNAME", ""), os.getenv("NEO4J_PASSWORD", "")),
+        )
+        with driver:
+            print(f"Graph version is now {bump_graph_version(driver)}")
+    elif args.command == "clear":
+        if not args.path:
+            parser.error("no cache path given and RETRIEVAL_CACHE_PATH is not set")
+        with sqlite3.connect(args.path) as conn:
+            conn.execute("DELETE FROM retrieval_cache")
+        print(f"Cleared {args.path}")
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional
+
+import neo4j
+from neo4j import AsyncDriver
+from neo4j_graphrag.embeddings.base import Embedder
+from neo4j_graphrag.retrievers import VectorCypherRetriever
+from neo4j_graphrag.types import RetrieverResult, RetrieverResultItem
+
+
+logger = logging.getLogger(__name__)
+
+VECTOR_SEARCH_QUERY = """
+CALL db.index.vector.queryNodes($vector_index_name, $top_k, $query_vector)
+YIELD node, score
+"""
+
+
+class BatchVectorCypherRetriever(VectorCypherRetriever):
+    """
+    VectorCypherRetriever that formats the whole result set in one call to
+    `batch_formatter` (e.g. a BatchResultFormatter) instead of once per record.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        batch_formatter: Callable[[List[neo4j.Record]], List[RetrieverResultItem]],
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        self.batch_formatter = batch_formatter
+
+    def search(self, *args: Any, **kwargs: Any) -> RetrieverResult:
+        raw_result = self.get_search_results(*args, **kwargs)
+        metadata = raw_result.metadata or {}
+        metadata["__retriever"] = self.__class__.__name__
+        return RetrieverResult(items=self.batch_formatter(raw_result.records), metadata=metadata)
+
+
+class AsyncVectorCypherRetriever:
+    """
+    Async counterpart of neo4j_graphrag's VectorCypherRetriever.
+
+    The query is embedded on a worker thread (embedders are sync and CPU bound)
+    and the vector search plus `retrieval_query` run on the Neo4j async driver,
+    so a search never blocks the event loop.
+
+    Example:
+
+    .. code-block:: python
+
+      driver = neo4j.AsyncGraphDatabase.driver(URI, auth=AUTH)
+      retriever = AsyncVectorCypherRetriever(driver, "chunk_vec", embedder, QUERY_TEMPLATE)
+      result = await retriever.search(query_text="How do I manage fatigue?")
+    """
+
+    def __init__(
+        self,
+        driver: AsyncDriver,
+        index_name: str,
+        embedder: Embedder,
+        retrieval_query: str,
+        result_formatter: Optional[Callable[[neo4j.Record], RetrieverResultItem]] = None,
+        neo4j_database: Optional[str] = None,
+        batch_formatter: Optional[Callable[[List[neo4j.Record]], List[RetrieverResultItem]]] = None,
+    ):
+        self.driver = driver
+        self.index_name = index_name
+        self.embedder = embedder
+        self.retrieval_query = retrieval_query
+        self.result_formatter = result_formatter
+        self.neo4j_database = neo4j_database
+        self.batch_formatter = batch_formatter
+
+    async def embed(self, query_text: str) -> List[float]:
+        return await asyncio.to_thread(self.embedder.embed_query, query_text)
+
+    async def search(
+        self,
+        query_text: Optional[str] = None,
+        query_vector: Optional[List[float]] = None,
+        top_k: int = 5,
+        query_params: Optional[dict[str, Any]] = None,
+    ) -> RetrieverResult:
+        if query_vector is None:
+            if query_text is None:
+                raise ValueError("Either query_text or query_vector must be provided")
+            query_vector = await self.embed(query_text)
+
+        parameters = {
+            **(query_params or {}),
+            "vector_index_name": self.index_name,
+            "top_k": top_k,
+            "query_vector": query_vector,
+        }
+        search_query = f"{VECTOR_SEARCH_QUERY}{self.retrieval_query}"
+        logger.debug(f"AsyncVectorCypherRetriever Cypher query: {search_query}")
+
+        records, _, _ = await self.driver.execute_query(
+            search_query,
+            parameters,
+            database_=self.neo4j_database,
+            routing_=neo4j.RoutingControl.READ,
+        )
+        if self.batch_formatter:
+            items = self.batch_formatter(records)
+        else:
+            items = [self.format_record(record) for record in records]
+        return RetrieverResult(
+            items=items,
+            metadata={"__retriever": self.__class__.__name__},
+        )
+
+    def format_record(self, record: neo4j.Record) -> RetrieverResultItem:
+        if self.result_formatter:
+            return self.result_formatter(record)
+        return RetrieverResultItem(content=str(record), metadata=record.get("metadata"))
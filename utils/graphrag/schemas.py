@@ -13,9 +13,14 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import asyncio
+import json
 import logging
+import math
+import time
 import warnings
-from typing import Any, AsyncGenerator, List, Optional, Union, Generator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Awaitable, Callable, List, Optional, Tuple, Union, Generator
 
 from pydantic import ValidationError
 
@@ -32,10 +37,42 @@ from pydantic import BaseModel, ConfigDict, field_validator
 from neo4j_graphrag.generation.prompts import PromptTemplate
 
 from backend.models.personal import Personnel, PersonnelInfo
+from utils.graphrag.summary import ConversationSummaryStore
+from utils.graphrag.context import ContextPacker
+from utils.graphrag.answer_cache import ANSWER_CACHE_REQUESTS, SemanticAnswerCache, context_key
+from utils.pipelines.metrics import METRICS
 
 
 logger = logging.getLogger(__name__)
 
+CONVERSATION_SUMMARIES = METRICS.counter(
+    "graphrag_conversation_summaries_total",
+    "How the message history was condensed (verbatim, cached, extended, full).",
+    ["mode"],
+)
+SEARCH_STAGE_DURATION = METRICS.histogram(
+    "graphrag_search_stage_duration_seconds",
+    "Duration of each GraphRAG search stage.",
+    ["stage"],
+)
+PROMPT_TOKENS = METRICS.histogram(
+    "graphrag_prompt_tokens",
+    "Tokens in the prompt sent to the LLM for answer generation.",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+TIME_TO_FIRST_TOKEN = METRICS.histogram(
+    "graphrag_time_to_first_token_seconds",
+    "Time from the start of GraphRAG.asearch to its first answer token.",
+)
+
+SUMMARY_SYSTEM_MESSAGE = "You are a summarization assistant. Summarize the given text in no more than 300 words."
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
 class RagTemplate(PromptTemplate):
     DEFAULT_SYSTEM_INSTRUCTIONS = "Answer this specific user's question using the provided context."
     DEFAULT_TEMPLATE = """Document Information:
@@ -64,12 +101,20 @@ Answer:
         return super().format(query_text=query_text, context=context, roster_info=roster_info, exercise_info=exercise_info, sleep_info=sleep_info, user=user)
 
 class RagInitModel(BaseModel):
-    retriever: Retriever
+    # Any object with a `search` method, so cached or wrapped retrievers can be used
+    retriever: Any
     llm: Any
     prompt_template: RagTemplate
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
+    @field_validator("retriever")
+    def check_retriever(cls, value: Any) -> Any:
+        search = getattr(value, "search", None)
+        if search and callable(search):
+            return value
+        raise ValueError("retriever must have a search method")
+
     @field_validator("llm")
     def check_llm(cls, value: Any) -> Any:
         invoke = getattr(value, "invoke", None)
@@ -80,6 +125,10 @@ class RagInitModel(BaseModel):
 class RagResultModel(BaseModel):
     answer: str
     retriever_result: Optional[RetrieverResult] = None
+    # Seconds spent in each search stage, plus "total"
+    timings: dict[str, float] = {}
+    # Context packing counts and prompt token totals
+    metadata: dict[str, Any] = {}
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
@@ -119,6 +168,13 @@ class GraphRAG:
         retriever (Retriever): The retriever used to find relevant context to pass to the LLM.
         llm (LLMInterface): The LLM used to generate the answer.
         prompt_template (RagTemplate): The prompt template that will be formatted with context and user question and passed to the LLM.
+        summary_store (Optional[ConversationSummaryStore]): Rolling summaries of message histories, reused across turns. A new store is created if not given.
+        concurrent (bool): Default search mode. When True, retrieval on the raw query, history condensation and user context serialization run in parallel.
+        requery_threshold (float): In concurrent mode, retrieval is repeated with the condensed query when its cosine similarity to the raw query falls below this value.
+        async_retriever (Optional[Any]): Retriever with an async `search`, used by `asearch`. Without one, `asearch` runs `retriever` on a worker thread.
+        context_packer (Optional[ContextPacker]): Deduplicates, ranks and trims retrieved items to a token budget before they go into the prompt. A packer with the default budget is used if not given.
+        answer_cache (Optional[SemanticAnswerCache]): Answers to earlier questions with the same user context, returned without retrieval or generation for similar enough queries. Only used for questions without message history.
+        max_concurrent_searches (int): Concurrent-mode searches that can run their three parallel steps at once; size it to the caller's request concurrency. Call `close` to release the worker threads.
 
     Raises:
         RagInitializationError: If validation of the input arguments fail.
@@ -129,6 +185,13 @@ class GraphRAG:
         retriever: Retriever,
         llm: LLMInterface,
         prompt_template: RagTemplate = RagTemplate(),
+        summary_store: Optional[ConversationSummaryStore] = None,
+        concurrent: bool = False,
+        requery_threshold: float = 0.9,
+        async_retriever: Optional[Any] = None,
+        context_packer: Optional[ContextPacker] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        max_concurrent_searches: int = 8,
     ):
         try:
             validated_data = RagInitModel(
@@ -141,6 +204,20 @@ class GraphRAG:
         self.retriever = validated_data.retriever
         self.llm = validated_data.llm
         self.prompt_template = validated_data.prompt_template
+        self.summary_store = summary_store or ConversationSummaryStore()
+        self.concurrent = concurrent
+        self.requery_threshold = requery_threshold
+        self.async_retriever = async_retriever
+        self.context_packer = context_packer or ContextPacker()
+        self.answer_cache = answer_cache
+        # Each concurrent-mode search runs three steps at once
+        self._executor = ThreadPoolExecutor(
+            max_workers=3 * max(1, max_concurrent_searches), thread_name_prefix="graphrag-search"
+        )
+
+    def close(self) -> None:
+        """Stops the worker threads used by concurrent-mode searches."""
+        self._executor.shutdown(wait=False)
 
     def search(
         self,
@@ -150,6 +227,8 @@ class GraphRAG:
         retriever_config: Optional[dict[str, Any]] = None,
         return_context: Optional[bool] = None,
         response_fallback: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        concurrent: Optional[bool] = None,
     ) -> RagResultModel:
         """
         .. warning::
@@ -171,22 +250,15 @@ class GraphRAG:
                 search method; e.g.: top_k
             return_context (bool): Whether to append the retriever result to the final result (default: False).
             response_fallback (Optional[str]): If not null, will return this message instead of calling the LLM if context comes back empty.
+            conversation_id (Optional[str]): Identifies the conversation so its previous summary can be replaced rather than kept alongside the new one.
+            concurrent (Optional[bool]): Overrides the search mode set on the instance.
 
         Returns:
             RagResultModel: The LLM-generated answer.
 
         """
-        roster_info_str, exercise_info_str, sleep_info_str,user_info_str = "", "", "", ""
-        if user_info:
-            user_info_str=PersonnelInfo(
-                name=user_info.name,
-                position=user_info.position,
-                age=user_info.age,
-                gender=user_info.gender
-                ).model_dump_json()
-            exercise_info_str = user_info.exercise_info.model_dump_json() if user_info.exercise_info else ""
-            sleep_info_str = user_info.sleep_info.model_dump_json() if user_info.sleep_info else ""
-            roster_info_str = user_info.roster_info.model_dump_json() if user_info.roster_info else ""
+        start_time = time.perf_counter()
+        timings: dict[str, float] = {}
 
         if return_context is None:
             warnings.warn(
@@ -198,10 +270,6 @@ class GraphRAG:
         try:
             validated_data = RagSearchModel(
                 query_text=query_text,
-                exercise_info=exercise_info_str,
-                roster_info=roster_info_str,
-                sleep_info=sleep_info_str,
-                user=user_info_str,
                 retriever_config=retriever_config or {},
                 return_context=return_context,
                 response_fallback=response_fallback,
@@ -210,146 +278,423 @@ class GraphRAG:
             raise SearchValidationError(e.errors())
         if isinstance(message_history, MessageHistory):
             message_history = message_history.messages
-        query = self._build_query(validated_data.query_text, message_history)
-        retriever_result: RetrieverResult = self.retriever.search(
-            query_text=query, **validated_data.retriever_config
-        )
+
+        # A cached answer has no retriever result to return with it
+        answer_key = None
+        if not return_context:
+            answer_key = self._answer_cache_key(
+                validated_data.query_text, message_history, user_info, validated_data.retriever_config
+            )
+        if answer_key is not None:
+            answer = self._timed(timings, "answer_cache", self.answer_cache.lookup, *answer_key)
+            if answer is not None:
+                timings["total"] = time.perf_counter() - start_time
+                return RagResultModel(answer=answer, timings=timings, metadata={"answer_cache": "hit"})
+
+        if concurrent is None:
+            concurrent = self.concurrent
+        if concurrent:
+            user_context, retriever_result = self._search_concurrent(
+                validated_data, message_history, user_info, conversation_id, timings
+            )
+        else:
+            user_context = self._timed(timings, "user_context", self._serialize_user_info, user_info)
+            query = self._timed(
+                timings, "condensation", self._build_query,
+                validated_data.query_text, message_history, conversation_id,
+            )
+            retriever_result = self._timed(
+                timings, "retrieval", self.retriever.search,
+                query_text=query, **validated_data.retriever_config,
+            )
+        user_info_str, roster_info_str, exercise_info_str, sleep_info_str = user_context
+
+        metadata: dict[str, Any] = {}
         if len(retriever_result.items) == 0 and response_fallback is not None:
             answer = response_fallback
         else:
-            context = "\n".join(item.content for item in retriever_result.items)
+            context, metadata = self._timed(
+                timings, "packing", self.context_packer.pack, retriever_result.items
+            )
             prompt = self.prompt_template.format(
                 query_text=query_text, context=context, roster_info=roster_info_str, exercise_info=exercise_info_str, sleep_info=sleep_info_str, user=user_info_str
             )
+            self._record_prompt_tokens(metadata, prompt)
             logger.debug(f"RAG: retriever_result={prettify(retriever_result)}")
             logger.debug(f"RAG: prompt={prompt}")
-            llm_response = self.llm.invoke(
+            llm_response = self._timed(
+                timings, "generation", self.llm.invoke,
                 prompt,
                 message_history,
                 system_instruction=self.prompt_template.system_instructions,
             )
             answer = llm_response.content
-        result: dict[str, Any] = {"answer": answer}
+            if answer_key is not None:
+                self.answer_cache.save(*answer_key, answer, user_id=getattr(user_info, "user_id", None))
+        timings["total"] = time.perf_counter() - start_time
+        result: dict[str, Any] = {"answer": answer, "timings": timings, "metadata": metadata}
         if return_context:
             result["retriever_result"] = retriever_result
         return RagResultModel(**result)
 
+    def _search_concurrent(
+        self,
+        validated_data: RagSearchModel,
+        message_history: Optional[List[LLMMessage]],
+        user_info: Optional[Personnel],
+        conversation_id: Optional[str],
+        timings: dict[str, float],
+    ) -> Tuple[Tuple[str, str, str, str], RetrieverResult]:
+        """
+        Retrieves on the raw query while the history is condensed and the user
+        context is serialized. Retrieval is only repeated with the condensed query
+        if it has drifted materially from the raw one.
+        """
+        query_text = validated_data.query_text
+        user_future = self._executor.submit(
+            self._timed, timings, "user_context", self._serialize_user_info, user_info
+        )
+        query_future = self._executor.submit(
+            self._timed, timings, "condensation", self._build_query,
+            query_text, message_history, conversation_id,
+        )
+        retrieval_future = self._executor.submit(
+            self._timed, timings, "retrieval", self.retriever.search,
+            query_text=query_text, **validated_data.retriever_config,
+        )
+
+        query = query_future.result()
+        retriever_result = retrieval_future.result()
+        if query != query_text and self._query_drifted(query_text, query):
+            retriever_result = self._timed(
+                timings, "requery", self.retriever.search,
+                query_text=query, **validated_data.retriever_config,
+            )
+        return user_future.result(), retriever_result
+
+    def _answer_cache_key(
+        self,
+        query_text: str,
+        message_history: Optional[List[LLMMessage]],
+        user_info: Optional[Personnel],
+        retriever_config: dict[str, Any],
+    ) -> Optional[Tuple[List[float], str]]:
+        """
+        Returns the (query vector, context key) an answer is cached under, or None
+        when the answer cache does not apply: answers that depend on earlier turns
+        are never cached.
+        """
+        if self.answer_cache is None:
+            return None
+        embedder = getattr(self.retriever, "embedder", None)
+        if message_history or embedder is None:
+            ANSWER_CACHE_REQUESTS.inc(result="bypass")
+            return None
+        # Retrieval embeds the same text next, so a caching embedder only computes it once
+        query_vector = embedder.embed_query(query_text)
+        context = context_key(
+            *self._serialize_user_info(user_info),
+            self.prompt_template.template,
+            self.prompt_template.system_instructions or "",
+            json.dumps(retriever_config, sort_keys=True, default=str),
+        )
+        return query_vector, context
+
+    def _query_drifted(self, query_text: str, query: str) -> bool:
+        embedder = getattr(self.retriever, "embedder", None)
+        if embedder is None:
+            return True
+        # The raw query was just embedded by the retriever, so a caching embedder answers it for free
+        similarity = cosine_similarity(embedder.embed_query(query_text), embedder.embed_query(query))
+        logger.debug(f"RAG: condensed query similarity={similarity:.3f}")
+        return similarity < self.requery_threshold
+
+    def _serialize_user_info(self, user_info: Optional[Personnel]) -> Tuple[str, str, str, str]:
+        """Returns the (user, roster, exercise, sleep) JSON strings passed to the prompt."""
+        if not user_info:
+            return "", "", "", ""
+        user_info_str = PersonnelInfo(
+            name=user_info.name,
+            position=user_info.position,
+            age=user_info.age,
+            gender=user_info.gender
+            ).model_dump_json()
+        roster_info_str = user_info.roster_info.model_dump_json() if user_info.roster_info else ""
+        exercise_info_str = user_info.exercise_info.model_dump_json() if user_info.exercise_info else ""
+        sleep_info_str = user_info.sleep_info.model_dump_json() if user_info.sleep_info else ""
+        return user_info_str, roster_info_str, exercise_info_str, sleep_info_str
+
+    def _timed(self, timings: dict[str, float], stage: str, func: Callable, *args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._record_timing(timings, stage, time.perf_counter() - start_time)
+
+    async def _atimed(self, timings: dict[str, float], stage: str, aw: Awaitable):
+        start_time = time.perf_counter()
+        try:
+            return await aw
+        finally:
+            self._record_timing(timings, stage, time.perf_counter() - start_time)
+
+    def _record_prompt_tokens(self, metadata: dict[str, Any], prompt: str):
+        prompt_tokens = self.context_packer.count_tokens(
+            f"{self.prompt_template.system_instructions or ''}\n{prompt}"
+        )
+        metadata["prompt_tokens"] = prompt_tokens
+        PROMPT_TOKENS.observe(prompt_tokens)
+
+    def _record_timing(self, timings: dict[str, float], stage: str, elapsed: float):
+        timings[stage] = elapsed
+        SEARCH_STAGE_DURATION.observe(elapsed, stage=stage)
+
     async def asearch(
         self,
         query_text: str = "",
         message_history: Optional[Union[List[LLMMessage], MessageHistory]] = None,
-        roster_info: str = "",
-        exercise_info: str = "",
-        sleep_info: str = "",
+        user_info: Personnel = None,
         retriever_config: Optional[dict[str, Any]] = None,
-        return_context: Optional[bool] = None,
         response_fallback: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        concurrent: Optional[bool] = None,
     ) -> AsyncGenerator[str, None]:
         """
-        .. warning::
-            The default value of 'return_context' will change from 'False' to 'True' in a future version.
-
+        Async, streaming counterpart of `search`.
 
-        This method performs a full RAG search:
-            1. Retrieval: context retrieval
-            2. Augmentation: prompt formatting
-            3. Generation: answer generation with LLM
+        History condensation goes through `llm.ainvoke`, retrieval through
+        `async_retriever` (or the sync retriever on a worker thread), and the
+        answer is yielded token by token from the LLM's async client.
 
 
         Args:
             query_text (str): The user question.
             message_history (Optional[Union[List[LLMMessage], MessageHistory]]): A collection previous messages,
                 with each message having a specific role assigned.
-            examples (str): Examples added to the LLM prompt.
+            user_info (Personnel): The person asking; their details, roster, exercise and sleep information are added to the prompt.
             retriever_config (Optional[dict]): Parameters passed to the retriever.
                 search method; e.g.: top_k
-            return_context (bool): Whether to append the retriever result to the final result (default: False).
-            response_fallback (Optional[str]): If not null, will return this message instead of calling the LLM if context comes back empty.
+            response_fallback (Optional[str]): If not null, will yield this message instead of calling the LLM if context comes back empty.
+            conversation_id (Optional[str]): Identifies the conversation so its previous summary can be replaced rather than kept alongside the new one.
+            concurrent (Optional[bool]): Overrides the search mode set on the instance.
 
-        Returns:
-            RagResultModel: The LLM-generated answer.
+        Yields:
+            str: The LLM-generated answer, one token at a time.
 
         """
-        if return_context is None:
-            warnings.warn(
-                "The default value of 'return_context' will change from 'False' to 'True' in a future version.",
-                DeprecationWarning,
-            )
-            return_context = False
+        start_time = time.perf_counter()
+        timings: dict[str, float] = {}
+
         try:
             validated_data = RagSearchModel(
                 query_text=query_text,
-                exercise_info=exercise_info,
-                roster_info=roster_info,
-                sleep_info=sleep_info,
                 retriever_config=retriever_config or {},
-                return_context=return_context,
                 response_fallback=response_fallback,
             )
         except ValidationError as e:
             raise SearchValidationError(e.errors())
         if isinstance(message_history, MessageHistory):
             message_history = message_history.messages
-        query = self._build_query(validated_data.query_text, message_history)
-        retriever_result: RetrieverResult = self.retriever.search(
-            query_text=query, **validated_data.retriever_config
+        user_info_str, roster_info_str, exercise_info_str, sleep_info_str = self._serialize_user_info(user_info)
+
+        query_text = validated_data.query_text
+        retriever_config = validated_data.retriever_config
+
+        answer_key = await asyncio.to_thread(
+            self._answer_cache_key, query_text, message_history, user_info, retriever_config
         )
-        if len(retriever_result.items) == 0 and response_fallback is not None:
-            answer = response_fallback
-        else:
-            context = "\n".join(item.content for item in retriever_result.items)
-            prompt = self.prompt_template.format(
-                query_text=query_text, context=context, roster_info=roster_info, exercise_info=exercise_info, sleep_info=sleep_info
+        if answer_key is not None:
+            answer = await self._atimed(
+                timings, "answer_cache", asyncio.to_thread(self.answer_cache.lookup, *answer_key)
             )
-            logger.debug(f"RAG: retriever_result={prettify(retriever_result)}")
-            logger.debug(f"RAG: prompt={prompt}")
-            # Implement streaming here
-            async_client = self.llm.async_client()
-            async def token_generator():
-                stream = await async_client.chat.completions.create(
-                    model=self.llm.model_name,
-                    messages=[
-                        {"role": "system", "content": self.prompt_template.system_instructions},
-                        *(
-                            [{"role": msg.role, "content": msg.content} for msg in message_history]
-                            if message_history
-                            else []
-                        ),
-                        {"role": "user", "content": prompt},
-                    ],
-                    stream=True,
+            if answer is not None:
+                TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start_time)
+                yield answer
+                return
+
+        if concurrent is None:
+            concurrent = self.concurrent
+        if concurrent:
+            query, retriever_result = await asyncio.gather(
+                self._atimed(timings, "condensation", self._abuild_query(query_text, message_history, conversation_id)),
+                self._atimed(timings, "retrieval", self._aretrieve(query_text, retriever_config)),
+            )
+            if query != query_text and await asyncio.to_thread(self._query_drifted, query_text, query):
+                retriever_result = await self._atimed(
+                    timings, "requery", self._aretrieve(query, retriever_config)
                 )
-                async for chunk in stream:
-                    if chunk.choices[0].delta.content:
-                        yield chunk.choices[0].delta.content
-            return token_generator()
+        else:
+            query = await self._atimed(
+                timings, "condensation", self._abuild_query(query_text, message_history, conversation_id)
+            )
+            retriever_result = await self._atimed(
+                timings, "retrieval", self._aretrieve(query, retriever_config)
+            )
+
+        if len(retriever_result.items) == 0 and response_fallback is not None:
+            yield response_fallback
+            return
+
+        context, metadata = self._timed(
+            timings, "packing", self.context_packer.pack, retriever_result.items
+        )
+        prompt = self.prompt_template.format(
+            query_text=query_text, context=context, roster_info=roster_info_str, exercise_info=exercise_info_str, sleep_info=sleep_info_str, user=user_info_str
+        )
+        self._record_prompt_tokens(metadata, prompt)
+        logger.debug(f"RAG: retriever_result={prettify(retriever_result)}")
+        logger.debug(f"RAG: prompt={prompt}")
+        logger.debug(f"RAG: context={metadata}")
+
+        generation_start = time.perf_counter()
+        tokens: List[str] = []
+        async for token in self._astream_answer(prompt, message_history):
+            if not tokens:
+                TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start_time)
+            tokens.append(token)
+            yield token
+        self._record_timing(timings, "generation", time.perf_counter() - generation_start)
+        # Only reached when the stream completed, so cancelled answers are never cached
+        if answer_key is not None:
+            self.answer_cache.save(*answer_key, "".join(tokens), user_id=getattr(user_info, "user_id", None))
+        timings["total"] = time.perf_counter() - start_time
+        logger.debug(f"RAG: timings={timings}")
+
+    async def _aretrieve(self, query_text: str, retriever_config: dict[str, Any]) -> RetrieverResult:
+        if self.async_retriever is not None:
+            return await self.async_retriever.search(query_text=query_text, **retriever_config)
+        return await asyncio.to_thread(self.retriever.search, query_text=query_text, **retriever_config)
+
+    async def _astream_answer(
+        self, prompt: str, message_history: Optional[List[LLMMessage]] = None
+    ) -> AsyncGenerator[str, None]:
+        async_client = getattr(self.llm, "async_client", None)
+        if async_client is None:
+            # LLMs without an OpenAI client still work, as a single chunk
+            llm_response = await self.llm.ainvoke(
+                prompt,
+                message_history,
+                system_instruction=self.prompt_template.system_instructions,
+            )
+            yield llm_response.content
+            return
+
+        stream = await async_client.chat.completions.create(
+            model=self.llm.model_name,
+            messages=[
+                {"role": "system", "content": self.prompt_template.system_instructions},
+                *(
+                    [{"role": message["role"], "content": message["content"]} for message in message_history]
+                    if message_history
+                    else []
+                ),
+                {"role": "user", "content": prompt},
+            ],
+            stream=True,
+            **(getattr(self.llm, "model_params", None) or {}),
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Stops the upstream generation too when the consumer goes away early
+            await stream.close()
 
     
     def _build_query(
         self,
         query_text: str,
         message_history: Optional[List[LLMMessage]] = None,
+        conversation_id: Optional[str] = None,
     ) -> str:
-        summary_system_message = "You are a summarization assistant. Summarize the given text in no more than 300 words."
-        if message_history:
-            summarization_prompt = self._chat_summary_prompt(
-                message_history=message_history
-            )
-            summary = self.llm.invoke(
+        query, summarization_prompt = self._plan_query(query_text, message_history)
+        if summarization_prompt is None:
+            return query
+
+        summary = self.llm.invoke(
+            input=summarization_prompt,
+            system_instruction=SUMMARY_SYSTEM_MESSAGE,
+        ).content
+        self.summary_store.save(message_history, summary, conversation_id)
+        return self.conversation_prompt(summary=summary, current_query=query_text)
+
+    async def _abuild_query(
+        self,
+        query_text: str,
+        message_history: Optional[List[LLMMessage]] = None,
+        conversation_id: Optional[str] = None,
+    ) -> str:
+        query, summarization_prompt = self._plan_query(query_text, message_history)
+        if summarization_prompt is None:
+            return query
+
+        summary = (
+            await self.llm.ainvoke(
                 input=summarization_prompt,
-                system_instruction=summary_system_message,
-            ).content
-            return self.conversation_prompt(summary=summary, current_query=query_text)
-        return query_text
+                system_instruction=SUMMARY_SYSTEM_MESSAGE,
+            )
+        ).content
+        self.summary_store.save(message_history, summary, conversation_id)
+        return self.conversation_prompt(summary=summary, current_query=query_text)
 
-    def _chat_summary_prompt(self, message_history: List[LLMMessage]) -> str:
+    def _plan_query(
+        self,
+        query_text: str,
+        message_history: Optional[List[LLMMessage]] = None,
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns (query, None) when the retrieval query can be built without the LLM,
+        or (None, summarization prompt) when the history has to be summarized first.
+        """
+        if not message_history:
+            return query_text, None
+
+        # Short histories go to the retriever as they are, without an LLM round trip
+        if not self.summary_store.should_summarize(message_history):
+            CONVERSATION_SUMMARIES.inc(mode="verbatim")
+            return self.conversation_prompt(
+                summary=self._format_history(message_history), current_query=query_text
+            ), None
+
+        summary, covered = self.summary_store.lookup(message_history)
+        if covered == len(message_history):
+            CONVERSATION_SUMMARIES.inc(mode="cached")
+            return self.conversation_prompt(summary=summary, current_query=query_text), None
+
+        if summary is not None:
+            # Only the turns since the last summary are sent to the LLM
+            CONVERSATION_SUMMARIES.inc(mode="extended")
+            return None, self._extend_summary_prompt(
+                summary=summary, message_history=message_history[covered:]
+            )
+
+        CONVERSATION_SUMMARIES.inc(mode="full")
+        return None, self._chat_summary_prompt(message_history=message_history)
+
+    def _format_history(self, message_history: List[LLMMessage]) -> str:
         message_list = [
             f"{message['role']}: {message['content']}" for message in message_history
         ]
-        history = "\n".join(message_list)
+        return "\n".join(message_list)
+
+    def _chat_summary_prompt(self, message_history: List[LLMMessage]) -> str:
+        history = self._format_history(message_history)
         return f"""
 Summarize the message history:
 
+{history}
+"""
+
+    def _extend_summary_prompt(self, summary: str, message_history: List[LLMMessage]) -> str:
+        history = self._format_history(message_history)
+        return f"""
+Update the summary of a conversation with its newest messages.
+
+Current summary:
+{summary}
+
+New messages:
 {history}
 """
 
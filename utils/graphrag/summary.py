@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from neo4j_graphrag.types import LLMMessage
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return len(text) // 4
+
+
+def prefix_hashes(messages: List[LLMMessage]) -> List[str]:
+    """
+    Returns one chained hash per history prefix: entry i identifies messages[: i + 1].
+    Any edit to an earlier message changes every later hash.
+    """
+    hashes = []
+    digest = b""
+    for message in messages:
+        digest = hashlib.sha256(
+            digest + f"{message['role']}\0{message['content']}\0".encode("utf-8")
+        ).digest()
+        hashes.append(digest.hex())
+    return hashes
+
+
+class ConversationSummaryStore:
+    """
+    Rolling conversation summaries keyed by a hash of the history prefix they cover.
+
+    `lookup` finds the longest prefix of a history that already has a summary, so
+    only the turns after it need to be sent to the LLM. When a conversation id is
+    passed to `save`, the conversation's previous summary is dropped, keeping one
+    entry per conversation; without one, old prefixes age out through the LRU.
+
+    Histories with fewer than `min_turns` messages and `min_tokens` estimated
+    tokens are not summarized at all (see `should_summarize`).
+    """
+
+    def __init__(
+        self,
+        max_size: int = 512,
+        ttl: float = 6 * 3600,
+        min_turns: int = 6,
+        min_tokens: int = 1500,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.min_turns = min_turns
+        self.min_tokens = min_tokens
+
+        self._lock = threading.Lock()
+        # prefix hash -> (expires_at, summary, conversation id)
+        self._entries: "OrderedDict[str, Tuple[float, str, Optional[str]]]" = OrderedDict()
+        self._conversations: Dict[str, str] = {}
+
+    def should_summarize(self, messages: List[LLMMessage]) -> bool:
+        if len(messages) >= self.min_turns:
+            return True
+        return sum(estimate_tokens(message["content"]) for message in messages) >= self.min_tokens
+
+    def lookup(self, messages: List[LLMMessage]) -> Tuple[Optional[str], int]:
+        """Returns (summary, number of messages it covers), or (None, 0) if nothing matches."""
+        now = time.monotonic()
+        hashes = prefix_hashes(messages)
+        with self._lock:
+            for i in range(len(hashes) - 1, -1, -1):
+                entry = self._entries.get(hashes[i])
+                if entry is None:
+                    continue
+                expires_at, summary, _ = entry
+                if expires_at < now:
+                    del self._entries[hashes[i]]
+                    continue
+                self._entries.move_to_end(hashes[i])
+                return summary, i + 1
+        return None, 0
+
+    def save(
+        self,
+        messages: List[LLMMessage],
+        summary: str,
+        conversation_id: Optional[str] = None,
+    ):
+        if not messages or self.max_size <= 0:
+            return
+
+        key = prefix_hashes(messages)[-1]
+        with self._lock:
+            if conversation_id is not None:
+                previous = self._conversations.get(conversation_id)
+                if previous is not None and previous != key:
+                    self._entries.pop(previous, None)
+                self._conversations[conversation_id] = key
+
+            self._entries[key] = (time.monotonic() + self.ttl, summary, conversation_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted, (_, _, evicted_conversation) = self._entries.popitem(last=False)
+                if self._conversations.get(evicted_conversation) == evicted:
+                    del self._conversations[evicted_conversation]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._conversations.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
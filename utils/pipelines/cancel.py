@@ -0,0 +1,117 @@
+import contextvars
+import logging
+import threading
+
+from typing import Awaitable, Callable, Iterator, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+
+class CancelToken:
+    """
+    Signals that the client of a streaming response has gone away.
+
+    Pipes get the token of the request they are serving from
+    `current_cancel_token()`, and can either poll `cancelled` or register an
+    `on_cancel` callback, e.g. to close an upstream HTTP response that is blocked
+    in a read.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def on_cancel(self, callback: Callable[[], None]):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.warning(f"Error in cancel callback {callback}: {e}")
+
+
+_cancel_token: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar(
+    "cancel_token", default=None
+)
+
+
+def current_cancel_token() -> CancelToken:
+    """Returns the token of the current request, or a token that is never cancelled."""
+    token = _cancel_token.get()
+    return token if token is not None else CancelToken()
+
+
+def set_cancel_token(token: CancelToken):
+    return _cancel_token.set(token)
+
+
+_STOP = object()
+
+
+class ThreadedIterator:
+    """
+    Async iterator over a sync iterator, stepped one item at a time off the event loop.
+
+    `close()` may be called while a step is still running in a worker thread; the
+    underlying iterator is closed as soon as that step returns.
+    """
+
+    def __init__(
+        self,
+        iterator: Iterator,
+        run_sync: Callable[..., Awaitable] = run_in_threadpool,
+    ):
+        self._iterator = iterator
+        self._run_sync = run_sync
+        # Steps run in the caller's context so pipes can see current_cancel_token()
+        self._context = contextvars.copy_context()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self._run_sync(self._next)
+        if item is _STOP:
+            raise StopAsyncIteration
+        return item
+
+    def _next(self):
+        with self._lock:
+            if self._closed:
+                return _STOP
+            return self._context.run(next, self._iterator, _STOP)
+
+    def close(self):
+        """Closes the iterator without blocking the caller."""
+        threading.Thread(target=self._close, daemon=True).start()
+
+    def _close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            close = getattr(self._iterator, "close", None)
+            if close:
+                try:
+                    close()
+                except Exception as e:
+                    logging.warning(f"Error closing pipe iterator: {e}")
@@ -1,5 +1,27 @@
-from haystack import component
-from typing import List
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+from haystack import Document, component
+
+from utils.pipelines.embeddings import EMBEDDING_MODELS, EmbeddingModelRegistry
+from utils.pipelines.metrics import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+RETRIEVER_BRANCH_DURATION = METRICS.histogram(
+    "hybrid_rag_retriever_duration_seconds",
+    "Duration of each ParallelRetriever branch, up to its timeout.",
+    ["branch"],
+)
+RETRIEVER_BRANCH_FAILURES = METRICS.counter(
+    "hybrid_rag_retriever_failures_total",
+    "ParallelRetriever branches that returned no documents because they failed or timed out.",
+    ["branch", "reason"],
+)
 
 @component
 class ThresholdFilter:
@@ -13,4 +35,140 @@ class ThresholdFilter:
     def run(self, documents: List):
         filtered_docs = [doc for doc in documents if doc.score >= self.threshold]
         return {"documents": filtered_docs}
-    
+
+
+@component
+class ParallelRetriever:
+    """
+    Runs several embedding retrievers concurrently on the same query embedding.
+
+    Each retriever gets its own output socket, named by its key in `retrievers`,
+    so the retrieval stage takes as long as the slowest store instead of the sum
+    of all of them. A branch that fails or exceeds its timeout (`timeouts[name]`,
+    else `timeout` seconds) returns no documents instead of failing the pipeline;
+    its lookup is left to finish in the background.
+
+    The thread pool is shared by concurrent `run` calls; `max_concurrent_runs`
+    should match the number of requests the pipeline admits at once, or branches
+    queue behind other requests and time out before they start. Call `close`
+    from the pipeline's on_shutdown.
+
+    Example:
+
+    .. code-block:: python
+
+      retriever = ParallelRetriever({"internal": int_retriever, "literature": lit_retriever}, timeout=5)
+      pipeline.add_component("retriever", retriever)
+      pipeline.connect("text_embedder.embedding", "retriever.query_embedding")
+      pipeline.connect("retriever.internal", "prompt_builder.internal_documents")
+    """
+    def __init__(
+        self,
+        retrievers: Dict[str, Any],
+        timeout: float = 5.0,
+        timeouts: Optional[Dict[str, float]] = None,
+        max_concurrent_runs: int = 8,
+    ):
+        self.retrievers = retrievers
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        # One worker per branch of every concurrent run, plus one spare round so a
+        # branch stuck past its timeout does not delay the next query
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(retrievers) * (max(1, max_concurrent_runs) + 1),
+            thread_name_prefix="parallel-retriever",
+        )
+        component.set_output_types(self, **{name: List[Document] for name in retrievers})
+
+    def _run_branch(self, name: str, retriever: Any, query_embedding: List[float], filters: Optional[Dict[str, Any]], top_k: Optional[int]):
+        start_time = time.perf_counter()
+        try:
+            return retriever.run(query_embedding=query_embedding, filters=filters, top_k=top_k)["documents"]
+        finally:
+            RETRIEVER_BRANCH_DURATION.observe(time.perf_counter() - start_time, branch=name)
+
+    def run(self, query_embedding: List[float], filters: Optional[Dict[str, Any]] = None, top_k: Optional[int] = None):
+        start_time = time.perf_counter()
+        futures = {
+            name: self._executor.submit(self._run_branch, name, retriever, query_embedding, filters, top_k)
+            for name, retriever in self.retrievers.items()
+        }
+
+        results = {}
+        for name, future in futures.items():
+            # Timeouts run from the fan-out, not from when this branch is collected
+            remaining = self.timeouts.get(name, self.timeout) - (time.perf_counter() - start_time)
+            try:
+                results[name] = future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                logger.warning(f"Retriever {name} timed out; continuing without its documents")
+                RETRIEVER_BRANCH_FAILURES.inc(branch=name, reason="timeout")
+                results[name] = []
+            except Exception as e:
+                logger.warning(f"Retriever {name} failed; continuing without its documents: {e}")
+                RETRIEVER_BRANCH_FAILURES.inc(branch=name, reason="error")
+                results[name] = []
+        return results
+
+    def close(self):
+        """Stops the worker threads; lookups still running are left to finish."""
+        self._executor.shutdown(wait=False)
+
+
+@component
+class SharedSentenceTransformersTextEmbedder:
+    """
+    Haystack text embedder on a model from the process-wide EMBEDDING_MODELS
+    registry, in place of SentenceTransformersTextEmbedder. Texts go through the
+    model's EmbeddingBatcher, batched with concurrent queries from other requests.
+
+    The model is acquired in `warm_up` and survives pipeline reloads while
+    another holder keeps it or its idle time-out has not passed. Call `release`
+    from the pipeline's on_shutdown; requests still running keep the batcher,
+    which encodes directly once the registry has evicted the model. A released
+    embedder is never warmed up again.
+    """
+    def __init__(
+        self,
+        model: str = "sentence-transformers/all-mpnet-base-v2",
+        prefix: str = "",
+        suffix: str = "",
+        normalize_embeddings: bool = False,
+        registry: Optional[EmbeddingModelRegistry] = None,
+        **model_kwargs,
+    ):
+        self.model = model
+        self.prefix = prefix
+        self.suffix = suffix
+        self.normalize_embeddings = normalize_embeddings
+        self.registry = registry or EMBEDDING_MODELS
+        self.model_kwargs = model_kwargs
+        self.embedding_model = None
+        self.batcher = None
+        self._lock = threading.Lock()
+        self._released = False
+
+    def warm_up(self):
+        with self._lock:
+            # Pipeline.run warms every component up, including after release
+            if self.embedding_model is None and not self._released:
+                self.embedding_model = self.registry.acquire(self.model, **self.model_kwargs)
+                self.batcher = self.registry.batcher(self.model, **self.model_kwargs)
+
+    def release(self):
+        with self._lock:
+            if self.embedding_model is None:
+                return
+            self.embedding_model = None
+            self._released = True
+        self.registry.release(self.model, **self.model_kwargs)
+
+    @component.output_types(embedding=List[float])
+    def run(self, text: str):
+        if not isinstance(text, str):
+            raise TypeError("SharedSentenceTransformersTextEmbedder expects a string as input.")
+        batcher = self.batcher
+        if batcher is None:
+            raise RuntimeError("The embedding model has not been loaded. Please call warm_up() before running.")
+        embedding = batcher.encode(self.prefix + text + self.suffix, normalize_embeddings=self.normalize_embeddings)
+        return {"embedding": embedding}
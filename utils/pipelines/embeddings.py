@@ -0,0 +1,405 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.pipelines.metrics import METRICS
+
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_SIZE = METRICS.histogram(
+    "pipelines_embedding_batch_size",
+    "Texts encoded together by an EmbeddingBatcher in one forward pass.",
+    ["model"],
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+TORCH = "torch"
+ONNX_INT8 = "onnx-int8"
+
+# Short questions like the ones the chatbots receive, for the parity check
+PARITY_TEXTS = [
+    "I'm fatigued after a string of night shifts, what should I do?",
+    "How much sleep do I need between two early shifts?",
+    "What is the procedure for reporting fatigue before a shift?",
+    "Can I swap a shift if I feel too tired to work safely?",
+    "Tips for staying alert during the last hours of a night shift",
+    "How does caffeine affect my sleep after a late shift?",
+    "What exercise helps with recovery after a long roster?",
+    "I have trouble falling asleep after work, any advice?",
+    "When should I take a controlled rest break?",
+    "What are the warning signs of burnout?",
+    "How do I adjust my sleep before switching from day to night shifts?",
+    "Is napping before a night shift a good idea?",
+]
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """Bytes held by a torch module's parameters and buffers; 0 for models without them."""
+    total = 0
+    for tensors in ("parameters", "buffers"):
+        for tensor in getattr(model, tensors, lambda: ())():
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent `encode` calls on one model into batched forward passes.
+
+    A dispatcher thread takes the first waiting text, then collects more for up
+    to `max_wait` seconds or until `max_batch_size` texts are waiting, encodes
+    them in one `model.encode` call and hands each caller its own vector.
+    Callers block in `encode` until then.
+    """
+
+    _STOP = object()
+
+    def __init__(self, model: Any, name: str = "", max_batch_size: int = 32, max_wait: float = 0.005):
+        self.model = model
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"embedding-batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def encode(self, text: str, normalize_embeddings: bool = False) -> List[float]:
+        future: Future = Future()
+        with self._lock:
+            # Closed batchers (model evicted while a request was in flight) encode directly
+            batched = self.max_batch_size > 1 and not self._closed
+            if batched:
+                self._queue.put((text, normalize_embeddings, future))
+        if not batched:
+            return self.model.encode([text], normalize_embeddings=normalize_embeddings)[0].tolist()
+        return future.result()
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                # Finish this batch, then stop
+                self._queue.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            self._encode_batch(self._collect(item))
+
+    def _encode_batch(self, batch: list):
+        # normalize_embeddings applies to a whole encode call
+        for normalize in {normalize for _, normalize, _ in batch}:
+            group = [(text, future) for text, n, future in batch if n == normalize]
+            try:
+                vectors = self.model.encode(
+                    [text for text, _ in group], batch_size=len(group), normalize_embeddings=normalize
+                )
+            except Exception as e:
+                for _, future in group:
+                    future.set_exception(e)
+                continue
+            EMBEDDING_BATCH_SIZE.observe(len(group), model=self.name)
+            for (_, future), vector in zip(group, vectors):
+                future.set_result(vector.tolist())
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # Nothing is queued after this, so the dispatcher drains what is left and stops
+            self._queue.put(self._STOP)
+
+
+@dataclass
+class LoadedModel:
+    name: str
+    kwargs: Dict[str, Any]
+    model: Any
+    bytes: int
+    load_seconds: float
+    refs: int = 0
+    idle_since: Optional[float] = None
+    batcher: Optional[EmbeddingBatcher] = None
+    loaded_at: float = field(default_factory=time.time)
+
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide SentenceTransformer models, loaded once and shared by reference count.
+
+    `acquire` returns the model for a (name, load kwargs) pair, loading it on first
+    use; `release` gives a reference back. A model nobody holds stays loaded for
+    `idle_ttl` seconds, so a pipeline that is reloaded (shutdown, then startup)
+    gets the same weights back instead of loading them again. The registry lives
+    in this module, which pipeline reloads do not re-import.
+
+    Holders that embed one query per request should go through `batcher`, so
+    concurrent requests on the same model share forward passes.
+    """
+
+    def __init__(self, idle_ttl: float = 300, max_batch_size: int = 32, max_wait: float = 0.005):
+        self.idle_ttl = idle_ttl
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._models: Dict[str, LoadedModel] = {}
+        # One lock per key, so pipelines starting together load a model once without serialising other models
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    @staticmethod
+    def key(name: str, **kwargs: Any) -> str:
+        return f"{name}|{json.dumps(kwargs, sort_keys=True, default=str)}" if kwargs else name
+
+    def acquire(self, name: str, **kwargs: Any) -> Any:
+        key = self.key(name, **kwargs)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    entry.refs += 1
+                    entry.idle_since = None
+                    return entry.model
+
+            from sentence_transformers import SentenceTransformer
+
+            start_time = time.perf_counter()
+            model = SentenceTransformer(name, **kwargs)
+            entry = LoadedModel(
+                name=name,
+                kwargs=kwargs,
+                model=model,
+                bytes=estimate_model_bytes(model),
+                load_seconds=time.perf_counter() - start_time,
+                refs=1,
+            )
+            logger.info(
+                f"Loaded embedding model {key} in {entry.load_seconds:.1f}s "
+                f"({entry.bytes / 2**20:.0f} MiB)"
+            )
+            with self._lock:
+                self._models[key] = entry
+            return model
+
+    def batcher(self, name: str, **kwargs: Any) -> EmbeddingBatcher:
+        """The EmbeddingBatcher shared by every holder of a model; `acquire` the model first."""
+        key = self.key(name, **kwargs)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                raise KeyError(f"Embedding model {key} is not loaded")
+            if entry.batcher is None:
+                entry.batcher = EmbeddingBatcher(entry.model, key, self.max_batch_size, self.max_wait)
+            return entry.batcher
+
+    def release(self, name: str, **kwargs: Any):
+        key = self.key(name, **kwargs)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None or entry.refs == 0:
+                return
+            entry.refs -= 1
+            if entry.refs > 0:
+                return
+            entry.idle_since = idle_since = time.monotonic()
+
+        if self.idle_ttl <= 0:
+            self._evict(key, idle_since)
+        else:
+            timer = threading.Timer(self.idle_ttl, self._evict, args=(key, idle_since))
+            timer.daemon = True
+            timer.start()
+
+    def _evict(self, key: str, idle_since: float):
+        with self._lock:
+            entry = self._models.get(key)
+            # Re-acquired (and maybe released again) since this eviction was scheduled
+            if entry is None or entry.refs > 0 or entry.idle_since != idle_since:
+                return
+            del self._models[key]
+        if entry.batcher is not None:
+            entry.batcher.close()
+        logger.info(f"Evicted idle embedding model {key}")
+        del entry
+        gc.collect()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {
+                    "model": entry.name,
+                    "kwargs": entry.kwargs,
+                    "refs": entry.refs,
+                    "bytes": entry.bytes,
+                    "load_seconds": round(entry.load_seconds, 3),
+                    "idle_seconds": (
+                        round(time.monotonic() - entry.idle_since, 1) if entry.idle_since is not None else None
+                    ),
+                }
+                for key, entry in self._models.items()
+            }
+
+
+def onnx_model_dir(onnx_dir: str, name: str) -> str:
+    return os.path.join(onnx_dir, name.replace("/", "__"))
+
+
+def quantized_file_name(quantization: str) -> str:
+    # Where export_dynamic_quantized_onnx_model saves the model for a quantization config
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+
+def require_onnx_runtime():
+    """Raises an ImportError with an install hint when the ONNX backend cannot be used."""
+    try:
+        import onnxruntime
+        import optimum.onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            f"The {ONNX_INT8!r} embedding backend needs Optimum and ONNX Runtime ({e}); "
+            "install them with `pip install \"optimum[onnxruntime]\"`"
+        ) from e
+
+
+def model_spec(
+    name: str,
+    backend: str = TORCH,
+    onnx_dir: str = "./models/onnx",
+    quantization: str = "avx512_vnni",
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Returns the (model name or path, SentenceTransformer kwargs) to load `name` with
+    on the given backend: "torch", or "onnx-int8" for the dynamically quantized
+    ONNX model written by `export_onnx_int8`.
+    """
+    if backend == TORCH:
+        return name, {}
+    if backend != ONNX_INT8:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected {TORCH!r} or {ONNX_INT8!r}")
+
+    path = onnx_model_dir(onnx_dir, name)
+    file_name = quantized_file_name(quantization)
+    if not os.path.exists(os.path.join(path, file_name)):
+        raise FileNotFoundError(
+            f"No quantized ONNX model at {os.path.join(path, file_name)}; run "
+            f"`python -m utils.pipelines.embeddings export {name} --onnx-dir {onnx_dir} --quantization {quantization}`"
+        )
+    require_onnx_runtime()
+    return path, {"backend": "onnx", "model_kwargs": {"file_name": file_name}}
+
+
+def export_onnx_int8(name: str, onnx_dir: str = "./models/onnx", quantization: str = "avx512_vnni") -> str:
+    """Exports `name` to ONNX and quantizes it to int8 with dynamic quantization; returns the model directory."""
+    require_onnx_runtime()
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    path = onnx_model_dir(onnx_dir, name)
+    model = SentenceTransformer(name, backend="onnx")
+    model.save_pretrained(path)
+    export_dynamic_quantized_onnx_model(model, quantization, path)
+    return path
+
+
+def parity_report(
+    name: str,
+    onnx_dir: str = "./models/onnx",
+    quantization: str = "avx512_vnni",
+    texts: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Cosine similarity between the PyTorch and int8 ONNX embeddings of the same texts."""
+    from sentence_transformers import SentenceTransformer
+
+    texts = texts or PARITY_TEXTS
+    path, kwargs = model_spec(name, ONNX_INT8, onnx_dir, quantization)
+    reference = SentenceTransformer(name).encode(texts, normalize_embeddings=True)
+    quantized = SentenceTransformer(path, **kwargs).encode(texts, normalize_embeddings=True)
+
+    cosines = sorted(float(a @ b) for a, b in zip(reference, quantized))
+    worst = min(range(len(texts)), key=lambda i: float(reference[i] @ quantized[i]))
+    return {
+        "model": name,
+        "quantization": quantization,
+        "texts": len(texts),
+        "mean_cosine": sum(cosines) / len(cosines),
+        "min_cosine": cosines[0],
+        "median_cosine": cosines[len(cosines) // 2],
+        "max_drift": 1 - cosines[0],
+        "worst_text": texts[worst],
+    }
+
+
+EMBEDDING_MODELS = EmbeddingModelRegistry(
+    idle_ttl=float(os.getenv("EMBEDDING_MODEL_IDLE_TTL", 300)),
+    # Queries from concurrent requests are encoded together; a batch size of 1 disables batching
+    max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 32)),
+    max_wait=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", 5)) / 1000,
+)
+
+METRICS.gauge(
+    "pipelines_embedding_model_bytes",
+    "Estimated memory of each loaded embedding model (parameters and buffers).",
+    ["model"],
+    collect=lambda: {(key,): s["bytes"] for key, s in EMBEDDING_MODELS.stats().items()},
+)
+METRICS.gauge(
+    "pipelines_embedding_model_refs",
+    "Holders of each loaded embedding model; 0 while it waits for idle eviction.",
+    ["model"],
+    collect=lambda: {(key,): s["refs"] for key, s in EMBEDDING_MODELS.stats().items()},
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and check int8 ONNX embedding models.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("export", help="Export a model to ONNX with dynamic int8 quantization.")
+    parity_parser = subparsers.add_parser("parity", help="Report the cosine drift of the int8 model from PyTorch.")
+    parity_parser.add_argument("--texts", help="file with one text per line (default: built-in questions)")
+    parity_parser.add_argument("--min-cosine", type=float, default=0.99, help="fail below this cosine")
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("model", nargs="?", default="intfloat/e5-large-v2")
+        subparser.add_argument("--onnx-dir", default=os.getenv("EMBEDDING_ONNX_DIR", "./models/onnx"))
+        subparser.add_argument(
+            "--quantization",
+            default=os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx512_vnni"),
+            choices=["arm64", "avx2", "avx512", "avx512_vnni"],
+        )
+    args = parser.parse_args()
+
+    if args.command == "export":
+        path = export_onnx_int8(args.model, args.onnx_dir, args.quantization)
+        print(f"Exported {args.model} to {os.path.join(path, quantized_file_name(args.quantization))}")
+    elif args.command == "parity":
+        texts = None
+        if args.texts:
+            with open(args.texts) as f:
+                texts = [line.strip() for line in f if line.strip()]
+        report = parity_report(args.model, args.onnx_dir, args.quantization, texts)
+        print(json.dumps(report, indent=2))
+        if report["min_cosine"] < args.min_cosine:
+            raise SystemExit(f"min cosine {report['min_cosine']:.4f} is below {args.min_cosine}")
@@ -0,0 +1,158 @@
+import asyncio
+import functools
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+
+class PipelineOverloaded(Exception):
+    """Raised when a pipeline has no free slot and its queue is full."""
+
+    def __init__(self, pipeline_id: str):
+        super().__init__(f"Pipeline {pipeline_id} is at capacity, try again later")
+        self.pipeline_id = pipeline_id
+
+
+class LimiterSlot:
+    """A granted slot; `release()` is idempotent so it can be tied to several exit paths."""
+
+    def __init__(self, limiter: "PipelineLimiter"):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release()
+
+
+class PipelineLimiter:
+    """
+    Bounds the work a single pipeline can have in flight.
+
+    At most `max_concurrency` requests run at once and at most `max_queue` wait for
+    a slot; anything beyond that is rejected immediately with PipelineOverloaded.
+    Sync pipes run on the limiter's own thread pool, so a slow pipeline cannot take
+    threads away from the others.
+    """
+
+    def __init__(self, pipeline_id: str, max_concurrency: int, max_queue: int):
+        self.pipeline_id = pipeline_id
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix=f"pipeline-{pipeline_id}"
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._closing = False
+
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def acquire(self) -> LimiterSlot:
+        if self.active >= self.max_concurrency and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PipelineOverloaded(self.pipeline_id)
+
+        start_time = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            self.waiting -= 1
+            self._shutdown_if_idle()
+            raise
+        self.waiting -= 1
+
+        wait = time.perf_counter() - start_time
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.admitted += 1
+        self.active += 1
+        return LimiterSlot(self)
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+        self._shutdown_if_idle()
+
+    def close(self):
+        """
+        Stops the thread pool once the requests already admitted or queued here
+        have finished; they keep running on it until then.
+        """
+        self._closing = True
+        self._shutdown_if_idle()
+
+    def _shutdown_if_idle(self):
+        if self._closing and self.active == 0 and self.waiting == 0:
+            self.executor.shutdown(wait=False)
+
+    async def run_sync(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_queue_wait_seconds": (
+                round(self.total_wait / self.admitted, 6) if self.admitted else 0.0
+            ),
+            "max_queue_wait_seconds": round(self.max_wait, 6),
+        }
+
+
+class PipelineLimiters:
+    """
+    One PipelineLimiter per pipeline id.
+
+    Limits come from the pipeline's `MAX_CONCURRENCY` / `MAX_QUEUE` valves when it
+    defines them, otherwise from the defaults. A limiter is replaced when those
+    values change; requests already admitted finish on the old one, whose threads
+    are then stopped.
+    """
+
+    def __init__(self, default_concurrency: int, default_queue: int):
+        self.default_concurrency = default_concurrency
+        self.default_queue = default_queue
+        self._limiters: Dict[str, PipelineLimiter] = {}
+
+    def get(self, pipeline_id: str, pipeline) -> PipelineLimiter:
+        valves = getattr(pipeline, "valves", None)
+        max_concurrency = getattr(valves, "MAX_CONCURRENCY", None) or self.default_concurrency
+        max_queue = getattr(valves, "MAX_QUEUE", None)
+        if max_queue is None:
+            max_queue = self.default_queue
+
+        limiter = self._limiters.get(pipeline_id)
+        if (
+            limiter is None
+            or limiter.max_concurrency != max_concurrency
+            or limiter.max_queue != max_queue
+        ):
+            if limiter is not None:
+                limiter.close()
+            limiter = PipelineLimiter(pipeline_id, max_concurrency, max_queue)
+            self._limiters[pipeline_id] = limiter
+        return limiter
+
+    def discard(self, pipeline_id: str):
+        limiter = self._limiters.pop(pipeline_id, None)
+        if limiter is not None:
+            limiter.close()
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            pipeline_id: limiter.stats()
+            for pipeline_id, limiter in self._limiters.items()
+        }
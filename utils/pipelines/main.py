@@ -1,7 +1,8 @@
 import uuid
 import time
+import json
 
-from typing import List
+from typing import List, Optional
 from schemas import OpenAIChatMessage
 
 import inspect
@@ -25,6 +26,76 @@ def stream_message_template(model: str, message: str):
     }
 
 
+class StreamEncoder:
+    """
+    Encodes the `chat.completion.chunk` SSE frames of a single response.
+
+    The envelope (one id and `created` per completion) is serialised once, so each
+    chunk only JSON-escapes its content and splices it between prebuilt bytes.
+    With `flush_interval` (seconds) or `flush_bytes` set, consecutive tokens are
+    coalesced into one frame until either threshold is reached.
+    """
+
+    def __init__(self, model: str, flush_interval: float = 0, flush_bytes: int = 0):
+        self.id = f"{model}-{str(uuid.uuid4())}"
+        self.created = int(time.time())
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+
+        envelope = json.dumps(
+            {
+                "id": self.id,
+                "object": "chat.completion.chunk",
+                "created": self.created,
+                "model": model,
+            }
+        )[:-1]
+        self._prefix = f'data: {envelope}, "choices": [{{"index": 0, "delta": {{"content": '.encode()
+        self._suffix = b'}, "logprobs": null, "finish_reason": null}]}\n\n'
+        self._finish = (
+            f'data: {envelope}, "choices": [{{"index": 0, "delta": {{}}, '
+            f'"logprobs": null, "finish_reason": "stop"}}]}}\n\n'
+            "data: [DONE]"
+        ).encode()
+
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+
+    def encode(self, content: str) -> bytes:
+        return self._prefix + json.dumps(content).encode() + self._suffix
+
+    def push(self, content: str) -> Optional[bytes]:
+        """Adds a token; returns a frame when one is due, otherwise None."""
+        if not self.flush_interval and not self.flush_bytes:
+            return self.encode(content)
+
+        self._pending.append(content)
+        self._pending_bytes += len(content.encode())
+
+        if (self.flush_bytes and self._pending_bytes >= self.flush_bytes) or (
+            self.flush_interval
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """Returns a frame with all pending tokens, or None if there are none."""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return None
+
+        content = "".join(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        return self.encode(content)
+
+    def finish(self) -> bytes:
+        """Returns the final `finish_reason: stop` frame followed by `[DONE]`."""
+        return self._finish
+
+
 def get_last_user_message(messages: List[dict]) -> str:
     for message in reversed(messages):
         if message["role"] == "user":
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Tuple
+
+
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    generation: int
+    pipelines: Mapping[str, Mapping]
+
+
+class PipelineRegistry:
+    """
+    Holds the last built view of all pipelines.
+
+    The view is only rebuilt when `rebuild()` is called (reload, upload/add/delete,
+    valves update). Readers take `snapshot` or `pipelines` without locking: a
+    rebuild swaps in a new immutable snapshot in a single assignment.
+    """
+
+    def __init__(self, builder: Callable[[], dict]):
+        self._builder = builder
+        self._lock = threading.Lock()
+        self._snapshot = RegistrySnapshot(generation=0, pipelines=MappingProxyType({}))
+
+    @property
+    def snapshot(self) -> RegistrySnapshot:
+        return self._snapshot
+
+    @property
+    def pipelines(self) -> Mapping[str, Mapping]:
+        return self._snapshot.pipelines
+
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    def rebuild(self) -> RegistrySnapshot:
+        with self._lock:
+            pipelines = self._builder()
+            self._snapshot = RegistrySnapshot(
+                generation=self._snapshot.generation + 1,
+                pipelines=MappingProxyType(
+                    {
+                        pipeline_id: MappingProxyType(dict(pipeline))
+                        for pipeline_id, pipeline in pipelines.items()
+                    }
+                ),
+            )
+            return self._snapshot
+
+
+@dataclass(frozen=True)
+class PipelineFile:
+    path: str
+    mtime: float
+    size: int
+    digest: str
+
+
+def file_digest(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def scan_pipeline_files(
+    directory: str, previous: Dict[str, PipelineFile] = {}
+) -> Dict[str, PipelineFile]:
+    """
+    Returns the state of every `.py` file in `directory`, keyed by module name.
+
+    Files whose mtime and size match `previous` keep their recorded digest, so
+    only touched files are re-hashed.
+    """
+    files = {}
+    for filename in os.listdir(directory):
+        if not filename.endswith(".py"):
+            continue
+
+        module_name = filename[:-3]
+        path = os.path.join(directory, filename)
+        stat = os.stat(path)
+
+        known = previous.get(module_name)
+        if known and known.mtime == stat.st_mtime and known.size == stat.st_size:
+            files[module_name] = known
+        else:
+            files[module_name] = PipelineFile(
+                path=path,
+                mtime=stat.st_mtime,
+                size=stat.st_size,
+                digest=file_digest(path),
+            )
+    return files
+
+
+def diff_pipeline_files(
+    previous: Dict[str, PipelineFile], current: Dict[str, PipelineFile]
+) -> Tuple[List[str], List[str], List[str]]:
+    """Returns the (added, changed, removed) module names between two scans."""
+    added = [name for name in current if name not in previous]
+    removed = [name for name in previous if name not in current]
+    changed = [
+        name
+        for name in current
+        if name in previous and current[name].digest != previous[name].digest
+    ]
+    return added, changed, removed
@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+from importlib import metadata
+from typing import Dict, List, Optional
+
+try:
+    from packaging.requirements import Requirement
+except ImportError:
+    Requirement = None
+
+
+# Written to PIPELINES_DIR/<module_name>/ once a pipeline's requirements are installed
+LOCK_FILENAME = "requirements.lock"
+
+
+def parse_frontmatter(content):
+    frontmatter = {}
+    for line in content.split("\n"):
+        if ":" in line:
+            key, value = line.split(":", 1)
+            frontmatter[key.strip().lower()] = value.strip()
+    return frontmatter
+
+
+def read_frontmatter(module_path: str) -> dict:
+    with open(module_path, "r") as file:
+        content = file.read()
+
+    if content.startswith('"""'):
+        end = content.find('"""', 3)
+        if end != -1:
+            return parse_frontmatter(content[3:end])
+    return {}
+
+
+def parse_requirements(requirements: str) -> List[str]:
+    return [req.strip() for req in requirements.split(",") if req.strip()]
+
+
+def requirements_digest(req_list: List[str]) -> str:
+    # The interpreter is part of the key: a new venv must be checked again
+    content = "\n".join([sys.executable, *sorted(set(req_list))])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def requirement_name(requirement: str) -> str:
+    return re.split(r"[\s<>=!~;\[@]", requirement, maxsplit=1)[0]
+
+
+def is_satisfied(requirement: str) -> bool:
+    try:
+        if Requirement is None:
+            metadata.version(requirement_name(requirement))
+            return True
+
+        req = Requirement(requirement)
+        if req.url:
+            return False
+        return req.specifier.contains(metadata.version(req.name), prereleases=True)
+    except metadata.PackageNotFoundError:
+        return False
+    except Exception:
+        # Unparseable requirements (VCS links, local paths) are left to pip
+        return False
+
+
+def resolve_versions(req_list: List[str]) -> Dict[str, Optional[str]]:
+    resolved = {}
+    for requirement in req_list:
+        name = requirement_name(requirement)
+        try:
+            resolved[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            resolved[name] = None
+    return resolved
+
+
+def read_lock(lock_path: str) -> Optional[dict]:
+    try:
+        with open(lock_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_lock(lock_path: str, digest: str, req_list: List[str]):
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "w") as f:
+        json.dump(
+            {
+                "digest": digest,
+                "python": sys.executable,
+                "requirements": req_list,
+                "resolved": resolve_versions(req_list),
+            },
+            f,
+            indent=2,
+        )
+
+
+def install_requirements(req_list: List[str]):
+    """Installs all requirements in a single uv (if available) or pip invocation."""
+    if shutil.which("uv"):
+        command = ["uv", "pip", "install", "--python", sys.executable, *req_list]
+    else:
+        command = [sys.executable, "-m", "pip", "install", *req_list]
+
+    print(f"Installing requirements: {' '.join(req_list)}")
+    subprocess.check_call(command)
+
+
+def ensure_requirements(directory: str, module_names: List[str]):
+    """
+    Makes sure the frontmatter requirements of the given pipelines are installed.
+
+    Pipelines whose requirements.lock matches their current requirement set are
+    skipped without touching pip. Requirements that are not already satisfied are
+    installed together in one batch, after which the lock files are written.
+    """
+    pending = []
+    missing = []
+
+    for module_name in module_names:
+        module_path = os.path.join(directory, f"{module_name}.py")
+        try:
+            frontmatter = read_frontmatter(module_path)
+        except (OSError, UnicodeDecodeError):
+            continue
+
+        req_list = parse_requirements(frontmatter.get("requirements", ""))
+        if not req_list:
+            continue
+
+        lock_path = os.path.join(directory, module_name, LOCK_FILENAME)
+        digest = requirements_digest(req_list)
+        lock = read_lock(lock_path)
+        if lock and lock.get("digest") == digest:
+            continue
+
+        for requirement in req_list:
+            if requirement not in missing and not is_satisfied(requirement):
+                missing.append(requirement)
+        pending.append((lock_path, digest, req_list))
+
+    if missing:
+        try:
+            install_requirements(missing)
+        except subprocess.CalledProcessError as e:
+            # Leave the locks unwritten; the affected modules fail on import
+            logging.error(f"Error installing requirements {missing}: {e}")
+            return
+
+    for lock_path, digest, req_list in pending:
+        write_lock(lock_path, digest, req_list)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Install the frontmatter requirements of every pipeline in a directory."
+    )
+    parser.add_argument("directory", nargs="?", default=os.getenv("PIPELINES_DIR", "./pipelines"))
+    args = parser.parse_args()
+
+    ensure_requirements(
+        args.directory,
+        [
+            filename[:-3]
+            for filename in os.listdir(args.directory)
+            if filename.endswith(".py")
+        ],
+    )